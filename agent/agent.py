@@ -2,10 +2,12 @@ import os
 import json5
 from qwen_agent.tools.base import BaseTool, register_tool
 from qwen_agent.utils.output_beautify import typewriter_print
-from datetime import datetime
 from qwen_agent.agents import Assistant
 
-from agent.skyscanner_api import create_flight_search, get_flight_from_airport, user_share_flight
+from agent.skyscanner_api import create_flight_search, fan_out, get_flight_from_airport, user_share_flight
+from agent.skyscanner_cache import TwoTierCache, cache_key
+from agent.prompt import system_prompt
+from agent.llm_gateway import gateway  # registers the 'gateway' model type
 
 
 model_server = os.environ.get('LLM_URL', "enter LLM_URL")
@@ -14,13 +16,44 @@ llm_cfg = {
     # Use the model service provided by DashScope:
     'model': 'qwen3:32b',
     'model_server': model_server,
+    # every request goes through agent/llm_gateway.py (pooling, concurrency caps, metrics)
+    'model_type': 'gateway',
     'generate_cfg': {
         'temperature': 0,
         'top_k': 1
     }
 }
 
-def make_bot(users):
+# Tool results are reused within a trip while the same call with the same users is repeated
+TOOL_CACHE_TTL = float(os.environ.get('TOOL_CACHE_TTL', 15 * 60))
+TOOL_CACHE_PATH = os.environ.get(
+    'TOOL_CACHE_PATH',
+    os.path.join(os.path.dirname(__file__), 'workspace', 'tool_cache.sqlite')
+)
+tool_cache = TwoTierCache(ttl=TOOL_CACHE_TTL, path=TOOL_CACHE_PATH)
+
+
+def tool_cache_key(trip_id, tool_name, params, selected_users):
+    """Key for a tool call: trip, tool, normalized arguments and the users' departure airports."""
+    args = {}
+    for name, value in params.items():
+        if value is None:
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+            if 'iata' in name:
+                value = value.upper()
+        if name == 'user_index_list':
+            value = [int(x) for x in value]
+        args[name] = value
+
+    return cache_key(f"tool/{trip_id}/{tool_name}", {
+        "args": args,
+        "users": [[user.get('name'), user.get('nearest_airport', [])] for user in selected_users],
+    })
+
+
+def make_bot(users, trip_id=None):
     class CreateTripTool(BaseTool):
         name = "create_trip"
         description = 'Query the cost of a flight from the Skyscanner API using IATA codes.'
@@ -61,18 +94,37 @@ def make_bot(users):
             # call the skyscanner api
             selected_users = [users[int(x)] for x in params['user_index_list']]
 
-            options_user = []
+            key = tool_cache_key(trip_id, self.name, params, selected_users)
+            cached = tool_cache.get(key)
+            if cached is not None:
+                print(f"Reusing cached {self.name} result")
+                return cached
+
+            departures = []
             for user in selected_users:
                 if "nearest_airport" in user and len(user['nearest_airport']) > 0:
                     # Use the first airport's IATA code
-                    departure_iata = user['nearest_airport'][0]
+                    departures.append(user['nearest_airport'][0])
                 else:
-                    departure_iata = "HEL"
-                options = create_flight_search(departure_iata, arrival_iata, outbound_date, inbound_date)
-                options_user.append({"name": user['name'], "options": options})
-                # print(options)
-            
-            return json5.dumps({
+                    departures.append("HEL")
+            departure_iata = departures[-1] if departures else None
+
+            # users flying from the same airport share one search, distinct searches run in parallel
+            searches = list(dict.fromkeys((departure, arrival_iata, outbound_date, inbound_date) for departure in departures))
+            outcomes = dict(zip(searches, fan_out(create_flight_search, [(search, {}) for search in searches])))
+
+            options_user = []
+            failed = False
+            for user, departure in zip(selected_users, departures):
+                options, error = outcomes[(departure, arrival_iata, outbound_date, inbound_date)]
+                if error is not None:
+                    print(f"Flight search from {departure} failed: {error}")
+                    options_user.append({"name": user['name'], "error": f"Could not search flights from {departure}"})
+                    failed = True
+                else:
+                    options_user.append({"name": user['name'], "options": options})
+
+            result = json5.dumps({
                 "departure_iata": departure_iata,
                 "arrival_iata": arrival_iata,
                 "outbound_date": outbound_date,
@@ -80,6 +132,10 @@ def make_bot(users):
                 "options": options_user,
             }, ensure_ascii=False)
 
+            if not failed:
+                tool_cache.set(key, result)
+            return result
+
     class FindSharedFlightTool(BaseTool):
         name = "find_shared_flight"
         description = 'Find the cheapest flight for the users.'
@@ -113,6 +169,12 @@ def make_bot(users):
             airport_iata_to = params.get('airport_iata_to', None)
             # Get selected users
             selected_users = [users[int(x)] for x in user_index_list]
+
+            key = tool_cache_key(trip_id, self.name, params, selected_users)
+            cached = tool_cache.get(key)
+            if cached is not None:
+                print(f"Reusing cached {self.name} result")
+                return cached
             # print(selected_users)
             print(len(selected_users))
             
@@ -129,38 +191,38 @@ def make_bot(users):
             print(user_flight_data)
             print(len(user_flight_data))
             
-            # Find shared flights using the existing function
+            # Find shared flights using the existing function, one search per user in parallel
+            calls = [((user_data["departure_iata"], user_data["start_date"], user_data["end_date"]),
+                      {"airport_iata_to": user_data["airport_iata_to"], "adults": 1})
+                     for user_data in user_flight_data]
+            results = fan_out(get_flight_from_airport, calls)
+
             raw_user_list = []
-            for user_data in user_flight_data:
-                res_user, places_user = get_flight_from_airport(
-                    user_data["departure_iata"],
-                    user_data["start_date"],
-                    user_data["end_date"],
-                    airport_iata_to=user_data["airport_iata_to"],
-                    adults=1
-                )
-                
+            found_users = []
+            failed_users = []
+            for user, (res, err) in zip(selected_users, results):
+                if err is not None:
+                    print(f"Flight search failed for {user['name']}: {err}")
+                    failed_users.append(user['name'])
+                    continue
+                res_user, places_user = res
                 raw_user_list.append(res_user)
+                found_users.append(user)
 
             print("PROBLEM2")
 
             # Get top 5 shared flight options
-            triplet_overlap_options = user_share_flight(raw_user_list, users)
+            triplet_overlap_options = user_share_flight(raw_user_list, found_users)
+
+            if failed_users:
+                triplet_overlap_options += f"\n\nCould not search flights for: {', '.join(failed_users)}"
+            else:
+                # partial results aren't worth keeping, the next call may get everybody
+                tool_cache.set(key, triplet_overlap_options)
             
             return triplet_overlap_options
-    system_instruction = f'''
-    You are a travel planner assistant helping the user and their friends organize trips based on the user information provided in the system message.
-    When the user requests travel advice or suggestions:
-    - DO NOT ANSWER WHEN THE CONVERSATION IS TOO VAGUE and not clear.
-    - First you need to use the function find_shared_flight to find the cheapest flight for ALL the users.
-    - Then you need to rule out the flights that might not be liked by the users. Alway leave up to 5 UNIQUE options.
-    - Then ask the user for their preferences on the available options.
-    - Given the answer, use the create_trip function FOR EACH USER TO GET THE FLIGHT PRICE.
-
-    Today's date is {datetime.now().strftime('%Y-%m-%d')}.
-
-    User details:
-    ''' + json5.dumps(users, ensure_ascii=False, indent=0)
+    # static instructions first, then the users; the date goes in the volatile part of the prompt
+    system_instruction = system_prompt(users)
 
     bot = Assistant(llm=llm_cfg,
                     system_message=system_instruction,
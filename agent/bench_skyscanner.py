@@ -0,0 +1,235 @@
+"""Benchmarks for the flight search and matching pipeline in agent/skyscanner_api.py.
+
+Parsing is measured end to end against the offline stand-in (zero latency, cache off);
+the matching functions run on synthetic quotes parameterized by number of users,
+quotes per user and distinct destinations. Each case reports wall time, peak traced
+memory and allocated blocks, and is compared against a stored baseline.
+
+The checked-in agent/bench_baseline.json is a snapshot taken right after the
+optimizations it measures, not of the code before them: it catches regressions
+from there on, it isn't a before/after comparison.
+
+    python -m agent.bench_skyscanner                  # run and compare with agent/bench_baseline.json
+    python -m agent.bench_skyscanner --save-baseline  # record a new baseline
+    python -m agent.bench_skyscanner --quick --filter overlap
+"""
+import os
+
+# benchmark the real work, not the indicative cache
+os.environ['SKYSCANNER_CACHE_PATH'] = ''
+os.environ['SKYSCANNER_CACHE_SIZE'] = '0'
+
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+import statistics
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+
+from agent import skyscanner_api
+from agent.skyscanner_client import client
+from agent.skyscanner_standin import start_in_thread
+from agent.quote_table import QuoteTable
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'bench_baseline.json')
+
+FULL_GRID = {
+    'users': [2, 4, 6],
+    'quotes': [50, 200],
+    'destinations': [10, 50],
+    'indicative_sizes': [100, 1000, 5000],
+    'live_sizes': [50, 500],
+}
+# a subset of FULL_GRID so quick runs still line up with the baseline
+QUICK_GRID = {
+    'users': [2],
+    'quotes': [50],
+    'destinations': [10],
+    'indicative_sizes': [100],
+    'live_sizes': [50],
+}
+
+
+def make_results(quotes, destinations, seed, origin="VIE"):
+    """Synthetic indicative `results` dict: `quotes` round trips spread over `destinations` places."""
+    rng = random.Random(seed)
+    places = {origin: {'entityId': origin, 'name': origin, 'iata': origin}}
+    for d in range(destinations):
+        places[f"D{d}"] = {'entityId': f"D{d}", 'name': f"Destination {d}", 'iata': f"D{d:02d}"}
+
+    quote_dict = {}
+    for i in range(quotes):
+        departure = date(2025, 6, 1) + timedelta(days=rng.randint(0, 45))
+        back = departure + timedelta(days=rng.randint(1, 16))
+        dest = f"D{rng.randrange(destinations)}"
+        quote_dict[f"{origin}-{dest}-{i}"] = {
+            'minPrice': {'amount': str(rng.randint(20, 600)), 'unit': 'PRICE_UNIT_WHOLE'},
+            'outboundLeg': {
+                'originPlaceId': origin, 'destinationPlaceId': dest,
+                'departureDateTime': {'year': departure.year, 'month': departure.month, 'day': departure.day,
+                                      'hour': 0, 'minute': 0, 'second': 0},
+            },
+            'inboundLeg': {
+                'originPlaceId': dest, 'destinationPlaceId': origin,
+                'departureDateTime': {'year': back.year, 'month': back.month, 'day': back.day,
+                                      'hour': 0, 'minute': 0, 'second': 0},
+            },
+        }
+    return {'quotes': quote_dict, 'places': places}
+
+
+def make_user_tables(users, quotes, destinations, seed=0):
+    return [QuoteTable.from_response(make_results(quotes, destinations, seed + u, origin=f"O{u}")).sorted_by_price()
+            for u in range(users)]
+
+
+def measure(fn, repeat):
+    """Run fn repeat times: median/min wall time, then one traced run for memory."""
+    times = []
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        fn()  # warm up
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+        # taken while the result is alive: every block the run allocated and hasn't freed
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        del result
+        alloc_blocks = sum(stat.count for stat in snapshot.statistics('filename'))
+
+    return {
+        'median_s': statistics.median(times),
+        'min_s': min(times),
+        'peak_kb': peak / 1024,
+        'alloc_blocks': alloc_blocks,
+    }
+
+
+def use_standin(**kwargs):
+    """Point the shared client at a fresh stand-in. Returns the teardown, which puts the client back."""
+    previous_url = client.base_url
+    base_url, server = start_in_thread(**kwargs)
+    client.base_url = base_url
+
+    def teardown():
+        try:
+            server.shutdown()
+        finally:
+            client.base_url = previous_url
+    return teardown
+
+
+def cases(grid):
+    """Yield (name, fn) for every benchmark case in the grid."""
+    users_list = {'start_date': '2025-06-05', 'end_date': '2025-07-10'}
+
+    for size in grid['indicative_sizes']:
+        def parse_indicative(size=size):
+            teardown = use_standin(quotes=size)
+
+            def run():
+                return skyscanner_api.get_flight_from_airport("VIE", "2025-05-01", "2025-05-30")
+            return run, teardown
+        yield f"parse_indicative[quotes={size}]", parse_indicative
+
+    for size in grid['live_sizes']:
+        def parse_live(size=size):
+            teardown = use_standin(itineraries=size, polls_to_complete=0)
+
+            def run():
+                return skyscanner_api.create_flight_search("VIE", "AUH", "2025-05-06", k=5)
+            return run, teardown
+        yield f"parse_live[itineraries={size}]", parse_live
+
+    for users in grid['users']:
+        for quotes in grid['quotes']:
+            for destinations in grid['destinations']:
+                params = f"users={users},quotes={quotes},dest={destinations}"
+
+                def setup(users=users, quotes=quotes, destinations=destinations):
+                    tables = make_user_tables(users, quotes, destinations)
+                    names = [{'name': f"user{u}"} for u in range(users)]
+                    return tables, names
+
+                def filter_case(setup=setup):
+                    tables, _ = setup()
+                    return (lambda: skyscanner_api.filter_by_user_availability(tables, [users_list] * len(tables))), None
+
+                def overlap_case(setup=setup):
+                    tables, _ = setup()
+                    return (lambda: skyscanner_api.triplet_overlap(tables, k=5)), None
+
+                def top_k_case(setup=setup):
+                    tables, _ = setup()
+                    return (lambda: skyscanner_api.find_top_k_full_paths(tables, 5, min_days=3)), None
+
+                def format_case(setup=setup):
+                    tables, names = setup()
+                    matches = skyscanner_api.triplet_overlap(tables, k=5)
+                    return (lambda: skyscanner_api.format_trip_options(matches, 5, names)), None
+
+                yield f"filter_by_user_availability[{params}]", filter_case
+                yield f"triplet_overlap[{params}]", overlap_case
+                yield f"find_top_k_full_paths[{params}]", top_k_case
+                yield f"format_trip_options[{params}]", format_case
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Skyscanner flight pipeline')
+    parser.add_argument('--quick', action='store_true', help='one small point per case')
+    parser.add_argument('--filter', default='', help='only run cases whose name contains this')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--max-regression', type=float, default=None,
+                        help='exit non-zero if any median time exceeds baseline by this factor, e.g. 1.25')
+    args = parser.parse_args()
+
+    grid = QUICK_GRID if args.quick else FULL_GRID
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {}
+    regressions = []
+    print(f"{'case':<70} {'median ms':>10} {'peak KB':>10} {'blocks':>8} {'vs base':>8}")
+    for name, make_case in cases(grid):
+        if args.filter not in name:
+            continue
+        fn, teardown = make_case()
+        try:
+            stats = measure(fn, args.repeat)
+        finally:
+            if teardown:
+                teardown()
+        results[name] = stats
+
+        ratio = ''
+        if name in baseline:
+            r = stats['median_s'] / baseline[name]['median_s']
+            ratio = f"{r:.2f}x"
+            if args.max_regression and r > args.max_regression:
+                regressions.append(name)
+        print(f"{name:<70} {stats['median_s'] * 1000:>10.3f} {stats['peak_kb']:>10.1f} {stats['alloc_blocks']:>8} {ratio:>8}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+
+    if regressions:
+        print(f"Slower than baseline by more than {args.max_regression}x: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""Checks the LLM gateway's admission control against the offline model server stand-in.
+
+Runs concurrent requests through a fresh LLMGateway pointed at agent/llm_standin.py and
+checks what the stand-in actually saw: no more than the per-model and global caps in
+flight, requests past the caps waiting instead of failing, a full queue rejected right
+away and waiting requests given up with GatewayBusyError once their deadline passes.
+
+    python -m agent.check_llm_gateway
+"""
+import sys
+import time
+import threading
+
+from agent.llm_gateway import GatewayBusyError, LLMGateway
+from agent.llm_standin import start_in_thread
+
+MESSAGES = [{'role': 'user', 'content': 'Where should we go?'}]
+
+
+def run_concurrently(gateway, base_url, models, stream=False, head_start=0.0):
+    """
+    One request per entry of models, all started at once (the first one head_start
+    seconds earlier). Returns [(seconds, error or None), …].
+    """
+    results = [None] * len(models)
+    start = threading.Barrier(len(models))
+
+    def request(i, model):
+        start.wait()
+        if i:
+            time.sleep(head_start)
+        began = time.monotonic()
+        try:
+            response = gateway.chat_completion(model, base_url, 'EMPTY', messages=MESSAGES, stream=stream)
+            if stream:
+                for _ in response:
+                    pass
+            results[i] = (time.monotonic() - began, None)
+        except GatewayBusyError as e:
+            results[i] = (time.monotonic() - began, e)
+
+    threads = [threading.Thread(target=request, args=(i, model)) for i, model in enumerate(models)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def standin(ttft):
+    base_url, server = start_in_thread(ttft=ttft)
+    return base_url, server, server.app.config['STANDIN_STATS']
+
+
+def check_per_model_cap():
+    base_url, server, stats = standin(ttft=0.3)
+    try:
+        gateway = LLMGateway(max_concurrency=8, max_per_model=4, max_queue=32, queue_timeout=10)
+        results = run_concurrently(gateway, base_url, ['a'] * 10)
+    finally:
+        server.shutdown()
+
+    errors = [e for _, e in results if e]
+    slowest = max(seconds for seconds, _ in results)
+    ok = stats['max_in_flight'] == 4 and not errors and slowest >= 0.9  # 10 requests, 4 at a time: 3 rounds
+    print(f"per-model cap: max in flight {stats['max_in_flight']} (want 4), errors {len(errors)}, "
+          f"slowest {slowest:.2f}s (want >= 0.9s, the extra requests waited)")
+    return ok
+
+
+def check_global_cap():
+    base_url, server, stats = standin(ttft=0.3)
+    try:
+        gateway = LLMGateway(max_concurrency=8, max_per_model=4, max_queue=32, queue_timeout=10)
+        results = run_concurrently(gateway, base_url, ['a', 'b', 'c'] * 4, stream=True)
+    finally:
+        server.shutdown()
+
+    errors = [e for _, e in results if e]
+    metrics = gateway.metrics()
+    ok = stats['max_in_flight'] == 8 and not errors and metrics['active'] == 0 and metrics['completed'] == 12
+    print(f"global cap: max in flight {stats['max_in_flight']} (want 8), errors {len(errors)}, "
+          f"slots still held {metrics['active']}, completed {metrics['completed']}/12")
+    return ok
+
+
+def check_queue_limits():
+    base_url, server, stats = standin(ttft=1.5)
+    try:
+        # one running, two waiting, everything else finds the queue full
+        gateway = LLMGateway(max_concurrency=8, max_per_model=1, max_queue=2, queue_timeout=0.5)
+        results = run_concurrently(gateway, base_url, ['a'] * 5, head_start=0.1)
+    finally:
+        server.shutdown()
+
+    served = [seconds for seconds, e in results if e is None]
+    rejected = [seconds for seconds, e in results if e is not None and 'queue full' in str(e)]
+    timed_out = [seconds for seconds, e in results if e is not None and 'within' in str(e)]
+    metrics = gateway.metrics()
+    ok = (len(served) == 1 and len(rejected) == 2 and len(timed_out) == 2
+          and all(seconds < 0.3 for seconds in rejected)
+          and all(seconds >= 0.5 for seconds in timed_out)
+          and metrics['rejected'] == 2 and metrics['timed_out'] == 2 and metrics['waiting'] == 0)
+    print(f"queue limits: served {len(served)} (want 1), rejected at once {len(rejected)} (want 2), "
+          f"timed out after the deadline {len(timed_out)} (want 2, "
+          f"after {', '.join(f'{s:.2f}s' for s in timed_out) or '-'})")
+    return ok
+
+
+def main():
+    checks = [check_per_model_cap, check_global_cap, check_queue_limits]
+    failed = [check.__name__ for check in checks if not check()]
+    if failed:
+        print(f"FAILED: {', '.join(failed)}")
+        sys.exit(1)
+    print("All gateway checks passed.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+"""Single way out to the model server for every agent.
+
+Bots use llm_cfg with model_type 'gateway', which routes their completions through
+the shared `gateway` here instead of opening a new OpenAI client per request:
+
+- one pooled HTTP client per (server, key), keep-alive connections are reused
+- at most LLM_MAX_CONCURRENCY requests in flight overall and
+  LLM_MAX_CONCURRENCY_PER_MODEL per model
+- at most LLM_MAX_QUEUE requests waiting for a slot, each for at most
+  LLM_QUEUE_TIMEOUT seconds; past either limit the request fails fast with
+  GatewayBusyError instead of making the server slower for everybody
+- metrics: queue wait, time to first token and tokens/sec
+
+Try it against the offline stand-in: python -m agent.llm_standin --port 8082, then
+LLM_URL=http://localhost:8082/v1. python -m agent.check_llm_gateway checks the limits
+above against the stand-in.
+"""
+import os
+import copy
+import time
+import threading
+from collections import deque
+
+import httpx
+import openai
+from qwen_agent.llm.base import register_llm
+from qwen_agent.llm.oai import TextChatAtOAI
+
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', 8))
+LLM_MAX_CONCURRENCY_PER_MODEL = int(os.environ.get('LLM_MAX_CONCURRENCY_PER_MODEL', 4))
+LLM_MAX_QUEUE = int(os.environ.get('LLM_MAX_QUEUE', 32))
+LLM_QUEUE_TIMEOUT = float(os.environ.get('LLM_QUEUE_TIMEOUT', 30))
+LLM_POOL_SIZE = int(os.environ.get('LLM_POOL_SIZE', 16))
+LLM_CONNECT_TIMEOUT = float(os.environ.get('LLM_CONNECT_TIMEOUT', 5))
+LLM_READ_TIMEOUT = float(os.environ.get('LLM_READ_TIMEOUT', 300))
+
+
+class GatewayBusyError(openai.OpenAIError):
+    """No slot for the request: the wait queue is full or its deadline passed.
+    An OpenAIError so qwen_agent reports it like any other model service error."""
+
+
+class LLMGateway:
+    """Pooled clients plus admission control in front of the model server."""
+
+    def __init__(self, max_concurrency=LLM_MAX_CONCURRENCY, max_per_model=LLM_MAX_CONCURRENCY_PER_MODEL,
+                 max_queue=LLM_MAX_QUEUE, queue_timeout=LLM_QUEUE_TIMEOUT, pool_size=LLM_POOL_SIZE):
+        self.max_per_model = max_per_model
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.pool_size = pool_size
+        self._global = threading.BoundedSemaphore(max_concurrency)
+        self._per_model = {}  # model -> BoundedSemaphore
+        self._clients = {}  # (base_url, api_key) -> openai.OpenAI
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._active = 0
+        self._counters = {"requests": 0, "rejected": 0, "timed_out": 0, "failed": 0, "completed": 0}
+        self._queue_waits = deque(maxlen=1000)  # seconds
+        self._ttfts = deque(maxlen=1000)  # seconds
+        self._rates = deque(maxlen=1000)  # tokens/sec of streamed answers
+
+    def client(self, base_url, api_key):
+        key = (base_url, api_key)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                http_client = httpx.Client(
+                    limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                    timeout=httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+                )
+                client = openai.OpenAI(base_url=base_url or None, api_key=api_key, http_client=http_client)
+                self._clients[key] = client
+        return client
+
+    def _model_semaphore(self, model):
+        with self._lock:
+            semaphore = self._per_model.get(model)
+            if semaphore is None:
+                semaphore = self._per_model[model] = threading.BoundedSemaphore(self.max_per_model)
+        return semaphore
+
+    def _acquire(self, model, timeout=None):
+        """Wait for a per-model and a global slot. Returns the semaphores to release."""
+        timeout = self.queue_timeout if timeout is None else timeout
+        with self._lock:
+            self._counters["requests"] += 1
+            if self._waiting >= self.max_queue:
+                self._counters["rejected"] += 1
+                raise GatewayBusyError(f"LLM queue full ({self._waiting} waiting)")
+            self._waiting += 1
+
+        start = time.monotonic()
+        deadline = start + timeout
+        model_semaphore = self._model_semaphore(model)
+        acquired = []
+        try:
+            # per-model first, so a busy model doesn't sit on global slots while it waits
+            for semaphore in (model_semaphore, self._global):
+                if not semaphore.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                    for held in acquired:
+                        held.release()
+                    with self._lock:
+                        self._counters["timed_out"] += 1
+                    raise GatewayBusyError(f"No LLM slot for {model} within {timeout}s")
+                acquired.append(semaphore)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+        with self._lock:
+            self._active += 1
+            self._queue_waits.append(time.monotonic() - start)
+        return acquired
+
+    def _release(self, acquired, failed=False):
+        for semaphore in acquired:
+            semaphore.release()
+        with self._lock:
+            self._active -= 1
+            self._counters["failed" if failed else "completed"] += 1
+
+    def chat_completion(self, model, base_url, api_key, **kwargs):
+        """client.chat.completions.create behind the gateway; streams come back as a generator of chunks."""
+        if kwargs.get('stream'):
+            return self._stream(model, base_url, api_key, kwargs)
+
+        acquired = self._acquire(model)
+        failed = True
+        try:
+            response = self.client(base_url, api_key).chat.completions.create(model=model, **kwargs)
+            failed = False
+            return response
+        finally:
+            self._release(acquired, failed)
+
+    def _stream(self, model, base_url, api_key, kwargs):
+        acquired = self._acquire(model)
+        failed = True
+        try:
+            start = time.monotonic()
+            first_token_at = None
+            tokens = 0
+            response = self.client(base_url, api_key).chat.completions.create(model=model, **kwargs)
+            try:
+                for chunk in response:
+                    usage = getattr(chunk, 'usage', None)
+                    if usage is not None and usage.completion_tokens:
+                        tokens = usage.completion_tokens
+                    elif chunk.choices:
+                        delta = chunk.choices[0].delta
+                        if getattr(delta, 'content', None) or getattr(delta, 'reasoning_content', None) \
+                                or getattr(delta, 'tool_calls', None):
+                            # OpenAI-compatible servers send about one token per chunk
+                            tokens += 1
+                            if first_token_at is None:
+                                first_token_at = time.monotonic()
+                                with self._lock:
+                                    self._ttfts.append(first_token_at - start)
+                    yield chunk
+            except GeneratorExit:
+                # the consumer stopped early (e.g. a superseded answer), not a server failure
+                failed = False
+                raise
+            finally:
+                # also runs when the consumer stops early, the slot must not leak
+                response.close()
+            failed = False
+
+            if first_token_at is not None and tokens > 1:
+                elapsed = time.monotonic() - first_token_at
+                if elapsed > 0:
+                    with self._lock:
+                        self._rates.append((tokens - 1) / elapsed)
+        finally:
+            self._release(acquired, failed)
+
+    def metrics(self):
+        """Counters, slots in use and queue wait / TTFT (ms) and tokens/sec percentiles."""
+        with self._lock:
+            snapshot = dict(self._counters)
+            snapshot["waiting"] = self._waiting
+            snapshot["active"] = self._active
+            samples = {
+                "queue_wait_ms": sorted(w * 1000 for w in self._queue_waits),
+                "ttft_ms": sorted(t * 1000 for t in self._ttfts),
+                "tokens_per_s": sorted(self._rates),
+            }
+
+        def percentile(values, p):
+            return round(values[min(len(values) - 1, int(p * len(values)))], 2) if values else None
+
+        for name, values in samples.items():
+            snapshot[name] = {"p50": percentile(values, 0.5), "p95": percentile(values, 0.95)}
+        return snapshot
+
+
+# Shared gateway for the whole process
+gateway = LLMGateway()
+
+
+@register_llm('gateway')
+class GatewayChatModel(TextChatAtOAI):
+    """qwen_agent's OpenAI-compatible model, with every request going through `gateway`."""
+
+    def __init__(self, cfg=None):
+        super().__init__(cfg)
+        cfg = cfg or {}
+        base_url = (cfg.get('api_base') or cfg.get('base_url') or cfg.get('model_server') or '').strip()
+        api_key = (cfg.get('api_key') or os.getenv('OPENAI_API_KEY') or 'EMPTY').strip()
+
+        def _chat_complete_create(*args, **kwargs):
+            # same argument handling as TextChatAtOAI
+            extra_params = ['top_k', 'repetition_penalty']
+            if any((k in kwargs) for k in extra_params):
+                kwargs['extra_body'] = copy.deepcopy(kwargs.get('extra_body', {}))
+                for k in extra_params:
+                    if k in kwargs:
+                        kwargs['extra_body'][k] = kwargs.pop(k)
+            if 'request_timeout' in kwargs:
+                kwargs['timeout'] = kwargs.pop('request_timeout')
+            model = kwargs.pop('model', self.model)
+            return gateway.chat_completion(model, base_url, api_key, **kwargs)
+
+        self._chat_complete_create = _chat_complete_create
@@ -0,0 +1,122 @@
+"""Offline stand-in for an OpenAI-compatible model server (Ollama/vLLM), for the LLM gateway.
+
+Answers /v1/chat/completions with a canned reply, streamed word by word after a
+configurable time to first token, and counts how many requests it served at once
+so gateway limits can be checked. Point the bots at it with LLM_URL=http://localhost:8082/v1.
+
+    python -m agent.llm_standin --port 8082 --ttft 0.5 --tokens-per-s 30
+"""
+import json
+import time
+import uuid
+import argparse
+import threading
+
+from flask import Flask, Response, jsonify, request
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+DEFAULT_REPLY = "Sure! Let me look for flights that work for everybody in the group."
+
+
+def create_app(ttft=0.0, tokens_per_s=0.0, reply=DEFAULT_REPLY):
+    """
+    Build the stand-in Flask app.
+
+    Args:
+        ttft: seconds before the first token (or the whole answer when not streaming)
+        tokens_per_s: streaming speed after the first token, 0 = as fast as possible
+        reply: text of every answer, one word per streamed chunk
+    """
+    app = Flask(__name__)
+    lock = threading.Lock()
+    app.config['STANDIN_STATS'] = stats = {'requests': 0, 'in_flight': 0, 'max_in_flight': 0}
+    words = reply.split(' ')
+
+    def enter():
+        with lock:
+            stats['requests'] += 1
+            stats['in_flight'] += 1
+            stats['max_in_flight'] = max(stats['max_in_flight'], stats['in_flight'])
+
+    def leave():
+        with lock:
+            stats['in_flight'] -= 1
+
+    def chunk(completion_id, model, delta, finish_reason=None):
+        return {
+            'id': completion_id,
+            'object': 'chat.completion.chunk',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}],
+        }
+
+    @app.route('/v1/models', methods=['GET'])
+    def models():
+        return jsonify({'object': 'list', 'data': [{'id': 'standin', 'object': 'model'}]})
+
+    @app.route('/v1/chat/completions', methods=['POST'])
+    def chat_completions():
+        body = request.get_json()
+        model = body.get('model', 'standin')
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        enter()
+
+        if not body.get('stream'):
+            try:
+                time.sleep(ttft)
+            finally:
+                leave()
+            return jsonify({
+                'id': completion_id,
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': reply}, 'finish_reason': 'stop'}],
+                'usage': {'prompt_tokens': 0, 'completion_tokens': len(words), 'total_tokens': len(words)},
+            })
+
+        def stream():
+            try:
+                time.sleep(ttft)
+                yield f"data: {json.dumps(chunk(completion_id, model, {'role': 'assistant', 'content': ''}))}\n\n"
+                for i, word in enumerate(words):
+                    if i and tokens_per_s:
+                        time.sleep(1 / tokens_per_s)
+                    text = word if i == 0 else f" {word}"
+                    yield f"data: {json.dumps(chunk(completion_id, model, {'content': text}))}\n\n"
+                yield f"data: {json.dumps(chunk(completion_id, model, {}, 'stop'))}\n\n"
+                yield "data: [DONE]\n\n"
+            finally:
+                leave()
+
+        return Response(stream(), mimetype='text/event-stream')
+
+    return app
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def start_in_thread(host='127.0.0.1', port=0, quiet=True, **kwargs):
+    """Run the stand-in on a background thread. Returns (base_url, server); base_url ends in /v1."""
+    handler = QuietRequestHandler if quiet else WSGIRequestHandler
+    server = make_server(host, port, create_app(**kwargs), threaded=True, request_handler=handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://{host}:{server.server_port}/v1", server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Offline OpenAI-compatible model server stand-in')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8082)
+    parser.add_argument('--ttft', type=float, default=0.0, help='seconds to first token')
+    parser.add_argument('--tokens-per-s', type=float, default=0.0)
+    parser.add_argument('--reply', default=DEFAULT_REPLY)
+    args = parser.parse_args()
+
+    app = create_app(args.ttft, args.tokens_per_s, args.reply)
+    print(f"Model server stand-in on http://{args.host}:{args.port}/v1 (set LLM_URL to this)")
+    app.run(host=args.host, port=args.port, threaded=True)
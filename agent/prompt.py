@@ -0,0 +1,52 @@
+"""Prompt layout for the trip bot, ordered so the model server can reuse its prefix cache.
+
+Ollama/vLLM only skip the work for the part of a prompt that is byte-identical to
+one they have seen before, so the prompt goes from most to least stable:
+
+1. static instructions, the same for every trip and every day
+2. the trip's users in a canonical serialization, the same for every turn of a trip
+   (qwen_agent appends the tool descriptions to the system message, after this)
+3. volatile content: today's date, the conversation summary, then the chat itself
+"""
+import json
+import hashlib
+from datetime import datetime
+
+STATIC_INSTRUCTIONS = '''You are a travel planner assistant helping the user and their friends organize trips based on the user information provided in the system message.
+When the user requests travel advice or suggestions:
+- DO NOT ANSWER WHEN THE CONVERSATION IS TOO VAGUE and not clear.
+- First you need to use the function find_shared_flight to find the cheapest flight for ALL the users.
+- Then you need to rule out the flights that might not be liked by the users. Alway leave up to 5 UNIQUE options.
+- Then ask the user for their preferences on the available options.
+- Given the answer, use the create_trip function FOR EACH USER TO GET THE FLIGHT PRICE.
+- Today's date and a summary of the earlier conversation are given in the trip context message.'''
+
+
+def canonical_users(users):
+    """Same users -> same bytes: sorted keys, fixed separators. List order is kept, tools index into it."""
+    return json.dumps(users, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+def system_prompt(users):
+    """The stable part of the prompt: static instructions, then the trip's users."""
+    return f"{STATIC_INSTRUCTIONS}\n\nUser details:\n{canonical_users(users)}"
+
+
+def context_message(summary=None, today=None):
+    """The volatile preamble, sent as the first chat message right after the stable prefix."""
+    today = today or datetime.now().strftime('%Y-%m-%d')
+    content = f"[Trip context, not written by the group]\nToday's date is {today}."
+    if summary:
+        content += f"\n\nSummary of the earlier conversation:\n{summary}"
+    return {"role": "user", "content": content}
+
+
+def prompt_prefix(bot):
+    """Everything sent before the chat: the system prompt and the tool descriptions."""
+    tools = [tool.function for tool in bot.function_map.values()]
+    return bot.system_message + json.dumps(tools, sort_keys=True, ensure_ascii=False)
+
+
+def prefix_fingerprint(bot):
+    """Short hash of prompt_prefix, equal between turns that can reuse the model server's cache."""
+    return hashlib.sha256(prompt_prefix(bot).encode()).hexdigest()[:16]
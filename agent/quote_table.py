@@ -0,0 +1,157 @@
+import threading
+import numpy as np
+from datetime import date, datetime
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def to_epoch_day(d):
+    """Nested Skyscanner date dict -> days since 1970-01-01 (indicative quotes are date-only)."""
+    return date(d['year'], d['month'], d['day']).toordinal() - EPOCH_ORDINAL
+
+
+def from_epoch_day(day):
+    return datetime.fromordinal(int(day) + EPOCH_ORDINAL)
+
+
+def epoch_day_to_dict(day):
+    d = from_epoch_day(day)
+    return {'year': d.year, 'month': d.month, 'day': d.day, 'hour': 0, 'minute': 0, 'second': 0}
+
+
+class PlaceInterner:
+    """Maps Skyscanner place ids to small ints, shared by all tables so ids compare across users."""
+
+    def __init__(self):
+        self._index = {}
+        self.place_ids = []
+        self.names = []
+        self._lock = threading.Lock()
+
+    def intern(self, place_id, name=None):
+        idx = self._index.get(place_id)
+        if idx is None:
+            with self._lock:
+                idx = self._index.get(place_id)
+                if idx is None:
+                    idx = len(self.place_ids)
+                    self.place_ids.append(place_id)
+                    self.names.append(name)
+                    self._index[place_id] = idx
+        if name is not None and self.names[idx] is None:
+            self.names[idx] = name
+        return idx
+
+
+places_interner = PlaceInterner()
+
+
+class QuoteTable:
+    """
+    Columnar storage for parsed indicative quotes: one NumPy array per field instead
+    of one dict per quote. Dates are epoch days, places are interned ids.
+    Iterating or indexing with an int gives back the old per-quote dict, so code that
+    still expects a list of dicts keeps working.
+    """
+
+    __slots__ = ('origin', 'dest', 'price', 'departure', 'return_', '_rows')
+
+    def __init__(self, origin, dest, price, departure, return_, rows=None):
+        self.origin = origin
+        self.dest = dest
+        self.price = price
+        self.departure = departure
+        self.return_ = return_
+        # original dicts, only kept when the table was built from them
+        self._rows = rows
+
+    @classmethod
+    def from_response(cls, results):
+        quotes = results['quotes']
+        places = results['places']
+
+        origin, dest, price, departure, return_ = [], [], [], [], []
+        for quote in quotes.values():
+            origin_place_id = quote['outboundLeg']['originPlaceId']
+            destination_place_id = quote['outboundLeg']['destinationPlaceId']
+            origin.append(places_interner.intern(origin_place_id, places[origin_place_id]['name']))
+            dest.append(places_interner.intern(destination_place_id, places[destination_place_id]['name']))
+            price.append(int(quote['minPrice']['amount']))
+            departure.append(to_epoch_day(quote['outboundLeg']['departureDateTime']))
+            return_.append(to_epoch_day(quote['inboundLeg']['departureDateTime']))
+
+        return cls(np.array(origin, dtype=np.int32), np.array(dest, dtype=np.int32),
+                   np.array(price, dtype=np.int64), np.array(departure, dtype=np.int32),
+                   np.array(return_, dtype=np.int32))
+
+    @classmethod
+    def from_quotes(cls, quotes, dest_key='destination_place_id', start_key='departure_date',
+                    end_key='return_date', cost_key='price'):
+        """Build a table from a list of quote dicts (no-op for a QuoteTable)."""
+        if isinstance(quotes, cls):
+            return quotes
+        quotes = list(quotes)
+        return cls(
+            np.array([places_interner.intern(q.get('origin_place_id'), q.get('inbound_place_id')) for q in quotes], dtype=np.int32),
+            np.array([places_interner.intern(q[dest_key], q.get('outbound_place_id')) for q in quotes], dtype=np.int32),
+            np.array([int(q[cost_key]) for q in quotes], dtype=np.int64),
+            np.array([to_epoch_day(q[start_key]) for q in quotes], dtype=np.int32),
+            np.array([to_epoch_day(q[end_key]) for q in quotes], dtype=np.int32),
+            rows=quotes,
+        )
+
+    def __len__(self):
+        return len(self.price)
+
+    def row(self, i):
+        """The quote at position i in the dict format get_flight_from_airport used to return."""
+        if self._rows is not None:
+            return self._rows[i]
+        origin = int(self.origin[i])
+        dest = int(self.dest[i])
+        return {
+            'origin_place_id': places_interner.place_ids[origin],
+            'destination_place_id': places_interner.place_ids[dest],
+            'price': str(self.price[i]),
+            'inbound_place_id': places_interner.names[origin],
+            'outbound_place_id': places_interner.names[dest],
+            'departure_date': epoch_day_to_dict(self.departure[i]),
+            'return_date': epoch_day_to_dict(self.return_[i]),
+        }
+
+    def take(self, idx):
+        idx = np.asarray(idx)
+        idx = np.nonzero(idx)[0] if idx.dtype == bool else idx.astype(np.intp)
+        rows = None if self._rows is None else [self._rows[i] for i in idx.tolist()]
+        return QuoteTable(self.origin[idx], self.dest[idx], self.price[idx],
+                          self.departure[idx], self.return_[idx], rows=rows)
+
+    def sorted_by_price(self):
+        return self.take(np.argsort(self.price, kind='stable'))
+
+    def __getitem__(self, i):
+        if isinstance(i, (int, np.integer)):
+            return self.row(i)
+        if isinstance(i, slice):
+            i = np.arange(len(self))[i]
+        return self.take(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.row(i)
+
+    def to_list(self):
+        return list(self)
+
+
+def stack_tables(tables):
+    """
+    Concatenate the tables of several users into one batch so filters run once for everybody.
+    Returns (batch, user, pos): user[i] / pos[i] say which table and row batch row i came from.
+    """
+    sizes = [len(table) for table in tables]
+    batch = QuoteTable(*(np.concatenate([getattr(table, col) for table in tables])
+                         for col in ('origin', 'dest', 'price', 'departure', 'return_')))
+    user = np.repeat(np.arange(len(tables)), sizes)
+    pos = np.concatenate([np.arange(size) for size in sizes]) if sizes else np.zeros(0, dtype=np.intp)
+    return batch, user, pos
@@ -0,0 +1,161 @@
+import os
+import copy
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+SKYSCANNER_CACHE_TTL = float(os.environ.get('SKYSCANNER_CACHE_TTL', 6 * 3600))
+SKYSCANNER_CACHE_SIZE = int(os.environ.get('SKYSCANNER_CACHE_SIZE', 512))
+# set SKYSCANNER_CACHE_PATH to an empty string to keep the cache in memory only
+SKYSCANNER_CACHE_PATH = os.environ.get(
+    'SKYSCANNER_CACHE_PATH',
+    os.path.join(os.path.dirname(__file__), 'workspace', 'skyscanner_cache.sqlite')
+)
+# expired rows are deleted from the SQLite file at most this often (seconds)
+SKYSCANNER_CACHE_PURGE_INTERVAL = 600
+
+
+def cache_key(path, payload):
+    """Stable key for a request: same path + same query (whatever the dict order) -> same key."""
+    normalized = json.dumps({"path": path, "payload": payload}, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+class TwoTierCache:
+    """
+    In-memory LRU with a TTL, backed by a SQLite file so entries survive restarts.
+    Lookups go memory -> disk -> fetch; disk hits are promoted back into memory.
+    The file is opened on first use, not when the cache is created.
+
+    Values must be JSON-serializable. get() returns a copy, so callers are free
+    to modify what they get without touching the cached entry.
+
+    The disk tier can't fail a lookup: SQLite/file errors (locked database,
+    read-only workspace, ...) are counted in stats["disk_errors"] and the call
+    carries on from memory. If the file can't be opened at all, the cache stays
+    memory-only.
+    """
+
+    def __init__(self, ttl=SKYSCANNER_CACHE_TTL, maxsize=SKYSCANNER_CACHE_SIZE, path=SKYSCANNER_CACHE_PATH):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.path = path
+        self._memory = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expirations": 0,
+                      "disk_errors": 0}
+
+        self._db = None
+        self._next_purge = 0.0
+
+    def _connect(self):
+        # caller holds the lock
+        if self._db is None:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                db = sqlite3.connect(self.path, check_same_thread=False)
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, expires_at REAL NOT NULL, value TEXT NOT NULL)"
+                )
+                db.execute("CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)")
+                db.commit()
+            except (OSError, sqlite3.Error) as e:
+                print(f"Cache file {self.path} unusable, keeping the cache in memory only: {e}")
+                self.path = ''
+                raise
+            self._db = db
+        return self._db
+
+    def _disk_failed(self, e):
+        # caller holds the lock
+        self.stats["disk_errors"] += 1
+        print(f"Cache disk tier error: {e}")
+        if self._db is not None:
+            try:
+                self._db.rollback()
+            except sqlite3.Error:
+                pass
+
+    def _remember(self, key, expires_at, value):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return copy.deepcopy(entry[1])
+                del self._memory[key]
+                self.stats["expirations"] += 1
+
+            if self.path:
+                try:
+                    row = self._connect().execute(
+                        "SELECT expires_at, value FROM cache WHERE key = ? AND expires_at > ?", (key, now)
+                    ).fetchone()
+                except (OSError, sqlite3.Error) as e:
+                    self._disk_failed(e)
+                    row = None
+                if row is not None:
+                    self._remember(key, row[0], json.loads(row[1]))
+                    self.stats["disk_hits"] += 1
+                    return json.loads(row[1])
+
+            self.stats["misses"] += 1
+            return None
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if self.maxsize > 0:
+                # stored as its own copy, later changes to value by the caller don't leak in
+                self._remember(key, expires_at, copy.deepcopy(value))
+            if self.path:
+                serialized = json.dumps(value)
+                try:
+                    db = self._connect()
+                    db.execute(
+                        "INSERT OR REPLACE INTO cache (key, expires_at, value) VALUES (?, ?, ?)",
+                        (key, expires_at, serialized)
+                    )
+                    if now >= self._next_purge:
+                        db.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+                        self._next_purge = now + SKYSCANNER_CACHE_PURGE_INTERVAL
+                    db.commit()
+                except (OSError, sqlite3.Error) as e:
+                    self._disk_failed(e)
+
+    def get_or_fetch(self, key, fetch, should_cache=lambda value: True):
+        value = self.get(key)
+        if value is not None:
+            return value
+        value = fetch()
+        if should_cache(value):
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self.path:
+                try:
+                    db = self._connect()
+                    db.execute("DELETE FROM cache")
+                    db.commit()
+                except (OSError, sqlite3.Error) as e:
+                    self._disk_failed(e)
+
+
+# indicative prices are shared by every trip asking about the same origin and month
+indicative_cache = TwoTierCache()
@@ -0,0 +1,89 @@
+import os
+import time
+import random
+import requests
+from requests.adapters import HTTPAdapter
+
+SKYSCANNER_BASE_URL = os.environ.get('SKYSCANNER_BASE_URL', "https://partners.api.skyscanner.net/apiservices/v3")
+SKYSCANNER_API_KEY = os.environ.get('SKYSCANNER_API_KEY', "sh967490139224896692439644109194")
+
+# statuses worth retrying: rate limited or the upstream having a bad moment
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# longest Retry-After we wait out (seconds); asked for longer, we give up instead of tying up the thread
+SKYSCANNER_MAX_RETRY_AFTER = float(os.environ.get('SKYSCANNER_MAX_RETRY_AFTER', 10))
+
+
+class SkyscannerClient:
+    """
+    Thin wrapper around a pooled requests.Session for the Skyscanner partner API.
+    Keeps TCP/TLS connections alive between calls, bounds the number of
+    connections per host, applies a timeout to every request and retries
+    429/5xx responses with jittered exponential backoff (or Retry-After).
+    """
+
+    def __init__(self, base_url=None, api_key=None, pool_maxsize=10,
+                 connect_timeout=3.05, read_timeout=30, retries=3, backoff=0.5,
+                 max_retry_after=SKYSCANNER_MAX_RETRY_AFTER):
+        self.base_url = (base_url or SKYSCANNER_BASE_URL).rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_retry_after = max_retry_after
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_key or SKYSCANNER_API_KEY}",
+        })
+        # pool_block makes extra threads wait for a free connection instead of opening new ones
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, pool_block=True)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _sleep_before_retry(self, attempt, response=None):
+        """Wait before the next attempt. Returns False when the server asks to wait longer than max_retry_after."""
+        retry_after = response.headers.get('Retry-After', '') if response is not None else ''
+        if retry_after.isdigit():
+            if int(retry_after) > self.max_retry_after:
+                return False
+            # the server said when to come back, don't jitter below that
+            time.sleep(int(retry_after))
+            return True
+        # full jitter so parallel callers don't retry in lockstep
+        time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+        return True
+
+    def post(self, path, payload, idempotent=True):
+        """
+        POST payload to path and return the decoded JSON.
+
+        Pass idempotent=False for calls with side effects (creating a live search):
+        they are only retried when the request surely wasn't processed, i.e. the
+        connection couldn't be made or the server answered 429, so a slow answer
+        never turns into a second search.
+        """
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        retry_errors = (requests.ConnectionError, requests.Timeout) if idempotent else (requests.ConnectTimeout,)
+        retry_statuses = RETRY_STATUSES if idempotent else (429,)
+
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.session.post(url, json=payload, timeout=self.timeout)
+            except retry_errors:
+                if attempt == self.retries:
+                    raise
+                self._sleep_before_retry(attempt)
+                continue
+
+            if response.status_code in retry_statuses and attempt < self.retries:
+                if self._sleep_before_retry(attempt, response):
+                    continue
+
+            return response.json()
+
+    def close(self):
+        self.session.close()
+
+
+# shared client, so every call in the process reuses the same connection pool
+client = SkyscannerClient()
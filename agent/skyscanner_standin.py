@@ -0,0 +1,198 @@
+"""Offline stand-in for the Skyscanner partner API, built from the recorded responses.
+
+Serves the indicative and live-search endpoints from agent/res_dict_from.json and
+agent/res_dict_.json (optionally resized into synthetic variants), with configurable
+latency, error rate and response size. Point the client at it with
+SKYSCANNER_BASE_URL=http://localhost:8081 or SkyscannerClient(base_url=...).
+
+    python -m agent.skyscanner_standin --port 8081 --latency lognormal:-2.5,0.6 --error-rate 0.05
+"""
+import os
+import copy
+import json
+import math
+import time
+import uuid
+import random
+import argparse
+import threading
+from datetime import date, timedelta
+
+from flask import Flask, jsonify
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+FIXTURES_DIR = os.path.dirname(__file__)
+INDICATIVE_FIXTURE = os.path.join(FIXTURES_DIR, 'res_dict_from.json')
+LIVE_FIXTURE = os.path.join(FIXTURES_DIR, 'res_dict_.json')
+
+
+def parse_latency(spec):
+    """
+    'fixed:0.2', 'uniform:0.05,0.3' or 'lognormal:mu,sigma' (seconds) -> a function
+    returning one delay sample.
+    """
+    kind, _, args = spec.partition(':')
+    params = [float(x) for x in args.split(',')] if args else []
+    if kind == 'fixed':
+        return lambda rng: params[0] if params else 0.0
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(params[0], params[1])
+    if kind == 'lognormal':
+        return lambda rng: rng.lognormvariate(params[0], params[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def shift_date(d, days):
+    shifted = date(d['year'], d['month'], d['day']) + timedelta(days=days)
+    return dict(d, year=shifted.year, month=shifted.month, day=shifted.day)
+
+
+def resize_quotes(res_dict, size, rng):
+    """Indicative response with `size` quotes: recorded ones first, then jittered copies."""
+    res_dict = copy.deepcopy(res_dict)
+    results = res_dict['content']['results']
+    base = list(results['quotes'].items())
+    if size is None or not base:
+        return res_dict
+
+    quotes = {}
+    for i in range(size):
+        key, quote = base[i % len(base)]
+        if i >= len(base):
+            quote = copy.deepcopy(quote)
+            key = f"{key}#{i}"
+            quote['minPrice']['amount'] = str(max(1, round(int(quote['minPrice']['amount']) * rng.uniform(0.7, 1.3))))
+            days = rng.randint(-5, 5)
+            quote['outboundLeg']['departureDateTime'] = shift_date(quote['outboundLeg']['departureDateTime'], days)
+            quote['inboundLeg']['departureDateTime'] = shift_date(quote['inboundLeg']['departureDateTime'], days + rng.randint(-2, 2))
+        quotes[key] = quote
+    results['quotes'] = quotes
+    return res_dict
+
+
+def resize_itineraries(res_dict, size, rng):
+    """Live-search response with `size` itineraries: recorded ones first, then re-priced copies."""
+    res_dict = copy.deepcopy(res_dict)
+    results = res_dict['content']['results']
+    base = list(results['itineraries'].items())
+    if size is None or not base:
+        return res_dict
+
+    itineraries = {}
+    for i in range(size):
+        key, itinerary = base[i % len(base)]
+        if i >= len(base):
+            itinerary = copy.deepcopy(itinerary)
+            key = f"{key}#{i}"
+            factor = rng.uniform(0.7, 1.3)
+            for option in itinerary['pricingOptions']:
+                option['price']['amount'] = str(round(int(option['price']['amount']) * factor))
+                for item in option['items']:
+                    item['price']['amount'] = str(round(int(item['price']['amount']) * factor))
+        itineraries[key] = itinerary
+    results['itineraries'] = itineraries
+    return res_dict
+
+
+def create_app(latency='fixed:0', error_rate=0.0, quotes=None, itineraries=None, polls_to_complete=2, seed=0):
+    """
+    Build the stand-in Flask app.
+
+    Args:
+        latency: delay distribution per request, see parse_latency
+        error_rate: share of requests answered with a 429 or 503
+        quotes: number of quotes per indicative response (None = as recorded)
+        itineraries: number of itineraries per live search (None = as recorded)
+        polls_to_complete: polls before a live search reports RESULT_STATUS_COMPLETE;
+            itineraries are revealed gradually until then
+        seed: seed for latency, errors and synthetic data
+    """
+    app = Flask(__name__)
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+    sample_latency = parse_latency(latency)
+
+    with open(INDICATIVE_FIXTURE) as f:
+        indicative = resize_quotes(json.load(f), quotes, rng)
+    with open(LIVE_FIXTURE) as f:
+        live = resize_itineraries(json.load(f), itineraries, rng)
+
+    sessions = {}
+    app.config['STANDIN_STATS'] = stats = {'requests': 0, 'errors': 0}
+
+    def live_snapshot(session):
+        results = live['content']['results']
+        all_ids = list(results['itineraries'])
+        rounds = polls_to_complete + 1
+        shown = math.ceil(len(all_ids) * min(session['polls'] + 1, rounds) / rounds)
+        snapshot = dict(results, itineraries={i: results['itineraries'][i] for i in all_ids[:shown]})
+        complete = session['polls'] >= polls_to_complete
+        return {
+            'sessionToken': session['token'],
+            'status': 'RESULT_STATUS_COMPLETE' if complete else 'RESULT_STATUS_INCOMPLETE',
+            'action': 'RESULT_ACTION_REPLACED',
+            'content': dict(live['content'], results=snapshot),
+        }
+
+    @app.before_request
+    def simulate_network():
+        with rng_lock:
+            delay = sample_latency(rng)
+            fail = rng.random() < error_rate
+            status = rng.choice((429, 503))
+            stats['requests'] += 1
+            if fail:
+                stats['errors'] += 1
+        time.sleep(max(0.0, delay))
+        if fail:
+            return jsonify({'code': status, 'message': 'stand-in injected error'}), status
+
+    @app.route('/flights/indicative/search', methods=['POST'])
+    def indicative_search():
+        return jsonify(indicative)
+
+    @app.route('/flights/live/search/create', methods=['POST'])
+    def live_search_create():
+        session = {'token': str(uuid.uuid4()), 'polls': 0}
+        sessions[session['token']] = session
+        return jsonify(live_snapshot(session))
+
+    @app.route('/flights/live/search/poll/<session_token>', methods=['POST'])
+    def live_search_poll(session_token):
+        session = sessions.get(session_token)
+        if session is None:
+            return jsonify({'code': 404, 'message': 'Session not found'}), 404
+        session['polls'] += 1
+        return jsonify(live_snapshot(session))
+
+    return app
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def start_in_thread(host='127.0.0.1', port=0, quiet=True, **kwargs):
+    """Run the stand-in on a background thread. Returns (base_url, server); call server.shutdown() when done."""
+    handler = QuietRequestHandler if quiet else WSGIRequestHandler
+    server = make_server(host, port, create_app(**kwargs), threaded=True, request_handler=handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://{host}:{server.server_port}", server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Offline Skyscanner stand-in server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', default='fixed:0', help="fixed:S | uniform:LO,HI | lognormal:MU,SIGMA")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--quotes', type=int, default=None, help='quotes per indicative response')
+    parser.add_argument('--itineraries', type=int, default=None, help='itineraries per live search')
+    parser.add_argument('--polls-to-complete', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    app = create_app(args.latency, args.error_rate, args.quotes, args.itineraries, args.polls_to_complete, args.seed)
+    print(f"Skyscanner stand-in on http://{args.host}:{args.port} (set SKYSCANNER_BASE_URL to this)")
+    app.run(host=args.host, port=args.port, threaded=True)
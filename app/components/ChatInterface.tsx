@@ -2,7 +2,7 @@
 
 import { useState, useRef, useEffect, useCallback } from "react";
 import { Send, ChevronDown, ChevronRight } from "lucide-react";
-import { sendMessage } from "../lib/api";
+import { getTripMessages, sendMessage } from "../lib/api";
 import { io, Socket } from "socket.io-client";
 import ReactMarkdown from "react-markdown";
 import remarkGfm from "remark-gfm";
@@ -18,8 +18,25 @@ type Message = {
 type ChatInterfaceProps = {
   tripId: string;
   initialMessages?: Message[];
+  initialCursor?: string | null;
 };
 
+// A message as returned by /api/trip-info and /api/messages
+type HistoryMessage = {
+  id: number;
+  content: string;
+  created_at?: string;
+  user?: { id: number; name: string } | null;
+};
+
+export const toChatMessage = (msg: HistoryMessage): Message => ({
+  id: msg.id.toString(),
+  sender: msg.user?.id == undefined ? "llm" : "user", // AI messages have no user
+  text: msg.content,
+  timestamp: msg.created_at ? new Date(msg.created_at.replace(" ", "T")) : new Date(),
+  senderName: msg.user?.name || "AI",
+});
+
 const DEFAULT_MESSAGE = {
   id: "1",
   sender: "llm",
@@ -28,8 +45,10 @@ const DEFAULT_MESSAGE = {
   senderName: "AI",
 };
 
-const ChatInterface = ({ tripId, initialMessages = [] }: ChatInterfaceProps) => {
+const ChatInterface = ({ tripId, initialMessages = [], initialCursor = null }: ChatInterfaceProps) => {
   const [messages, setMessages] = useState<Message[]>(initialMessages.length > 0 ? initialMessages : [DEFAULT_MESSAGE]);
+  const [cursor, setCursor] = useState<string | null>(initialCursor);
+  const [loadingOlder, setLoadingOlder] = useState(false);
   const [input, setInput] = useState("");
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
@@ -136,6 +155,12 @@ const ChatInterface = ({ tripId, initialMessages = [] }: ChatInterfaceProps) =>
           }
           return updatedMessages;
         });
+      } else if (data.type === "cancel") {
+        // A newer message superseded this answer, drop the partial text
+        setMessages((prev) => prev.filter((msg) => msg.id !== data.message_id.toString()));
+      } else if (data.type === "error") {
+        // The AI was queued but couldn't run (queue full), no answer is coming
+        setError(data.error);
       }
     });
 
@@ -160,6 +185,21 @@ const ChatInterface = ({ tripId, initialMessages = [] }: ChatInterfaceProps) =>
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
   }, [messages]);
 
+  // Older history is fetched a page at a time, on demand
+  const loadOlderMessages = async () => {
+    if (!cursor || loadingOlder) return;
+    setLoadingOlder(true);
+    const response = await getTripMessages(Number(tripId), cursor);
+    if (response.error) {
+      setError(response.error);
+    } else {
+      const older = response.messages.map(toChatMessage);
+      setMessages((prev) => [...older, ...prev.filter((msg) => !older.some((o: Message) => o.id === msg.id))]);
+      setCursor(response.cursor);
+    }
+    setLoadingOlder(false);
+  };
+
   const handleSendMessage = async (e: React.FormEvent) => {
     e.preventDefault();
 
@@ -209,6 +249,18 @@ const ChatInterface = ({ tripId, initialMessages = [] }: ChatInterfaceProps) =>
       <div className="flex-1 overflow-y-auto p-4 space-y-4">
         {error && <div className="bg-red-50 border border-red-200 text-red-600 p-3 rounded-lg text-sm">{error}</div>}
 
+        {cursor && (
+          <div className="flex justify-center">
+            <button
+              onClick={loadOlderMessages}
+              disabled={loadingOlder}
+              className="text-xs text-indigo-600 hover:underline disabled:text-gray-400"
+            >
+              {loadingOlder ? "Loading..." : "Load earlier messages"}
+            </button>
+          </div>
+        )}
+
         {messages.map((message) => (
           <div key={message.id} className={`flex ${message.sender === "user" ? "justify-end" : "justify-start"}`}>
             <div
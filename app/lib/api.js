@@ -107,7 +107,7 @@ export async function joinTrip(data) {
 /**
  * Get information about a specific trip
  * @param {number} tripId - Trip ID
- * @returns {Promise<{trip: import('./types').Trip, is_member: boolean} | {error: string}>}
+ * @returns {Promise<{trip: import('./types').Trip, messages_cursor?: string | null, is_member: boolean} | {error: string}>}
  */
 export async function getTripInfo(tripId) {
   try {
@@ -122,6 +122,29 @@ export async function getTripInfo(tripId) {
   }
 }
 
+/**
+ * Get a page of a trip's chat history, newest page first
+ * @param {number} tripId - Trip ID
+ * @param {string} [before] - Cursor returned with the previous page, for older messages
+ * @returns {Promise<{messages: Array<import('./types').Message>, cursor: string | null} | {error: string}>}
+ */
+export async function getTripMessages(tripId, before) {
+  try {
+    const params = new URLSearchParams({ trip_id: tripId });
+    if (before) {
+      params.set('before', before);
+    }
+    const response = await fetch(`${API_BASE_URL}/messages?${params}`, {
+      method: 'GET',
+      credentials: 'include', // Important for cookie-based auth
+    });
+    
+    return handleResponse(response);
+  } catch (error) {
+    return { error: 'Network error. Please check your connection.' };
+  }
+}
+
 /**
  * Send a message in a trip
  * @param {Object} data - Message data
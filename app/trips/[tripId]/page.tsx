@@ -3,7 +3,7 @@
 import { useEffect, useState } from "react";
 import { useRouter } from "next/navigation";
 import UserCard from "../../components/UserCard";
-import ChatInterface from "../../components/ChatInterface";
+import ChatInterface, { toChatMessage } from "../../components/ChatInterface";
 import TripMap from "../../components/TripMap";
 import { getTripInfo } from "../../lib/api";
 
@@ -35,6 +35,7 @@ type User = {
 type TripMessage = {
   id: number;
   content: string;
+  created_at?: string;
   user: {
     id: number;
     name: string;
@@ -50,6 +51,7 @@ type Trip = {
 
 type TripData = {
   trip: Trip;
+  messages_cursor?: string | null;
   is_member: boolean;
 };
 
@@ -202,13 +204,8 @@ const TripPage: React.FC<TripPageProps> = ({ params }) => {
           <div className="bg-white rounded-lg shadow-md h-full">
             <ChatInterface
               tripId={tripId}
-              initialMessages={(tripData.trip.messages || []).map((msg) => ({
-                id: msg.id.toString(),
-                sender: msg.user?.id == undefined ? "llm" : "user", // Assuming user_id 0 is for AI messages
-                text: msg.content,
-                timestamp: new Date(), // The backend doesn't currently return timestamps
-                senderName: msg.user?.name || "AI",
-              }))}
+              initialMessages={(tripData.trip.messages || []).map(toChatMessage)}
+              initialCursor={tripData.messages_cursor}
             />
           </div>
 
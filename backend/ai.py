@@ -1,18 +1,272 @@
 import os
-import json5
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
 from qwen_agent.agents import Assistant
 from qwen_agent.tools.base import BaseTool, register_tool
-from qwen_agent.utils.output_beautify import typewriter_print
+from qwen_agent.llm.schema import ASSISTANT, FUNCTION
+from qwen_agent.utils.output_beautify import ANSWER_S, THOUGHT_S, TOOL_CALL_S, TOOL_RESULT_S
+from qwen_agent.utils.tokenization_qwen import count_tokens
 from datetime import datetime
 
 from agent.agent import make_bot
+from agent.prompt import prefix_fingerprint, prompt_prefix
 
-def get_ai_message(users, messages, socketio=None, trip_id=None):
-    users_json = json5.dumps(users, ensure_ascii=False, indent=0)
-    print("Getting AI message with users: ", users_json)
-    bot = make_bot(users)
+# Bots are rebuilt only when a trip's profiles change
+AGENT_CACHE_SIZE = int(os.environ.get('AGENT_CACHE_SIZE', 64))
+_bot_cache = OrderedDict()  # (trip_id, profiles_hash) -> bot
+_bot_cache_lock = threading.Lock()
 
-    response_plain_text = ""
+
+def get_bot(users, trip_id=None):
+    """Return a cached bot for this trip and set of profiles, building one on a miss."""
+    if trip_id is None:
+        return make_bot(users)
+
+    profiles_hash = hashlib.sha256(json.dumps(users, sort_keys=True, default=str).encode()).hexdigest()
+    key = (trip_id, profiles_hash)
+
+    with _bot_cache_lock:
+        bot = _bot_cache.get(key)
+        if bot is not None:
+            _bot_cache.move_to_end(key)
+            return bot
+
+    bot = make_bot(users, trip_id)
+
+    with _bot_cache_lock:
+        # drop bots built from an older set of profiles for this trip
+        for stale in [k for k in _bot_cache if k[0] == trip_id and k != key]:
+            del _bot_cache[stale]
+        _bot_cache[key] = bot
+        _bot_cache.move_to_end(key)
+        while len(_bot_cache) > AGENT_CACHE_SIZE:
+            _bot_cache.popitem(last=False)
+    return bot
+
+
+def invalidate_bot(trip_id):
+    """Forget the cached bots of a trip, called when someone joins or leaves it."""
+    with _bot_cache_lock:
+        for key in [k for k in _bot_cache if k[0] == trip_id]:
+            del _bot_cache[key]
+
+
+# Text the function-calling template wraps around the tool descriptions ("# Tools", call format, ...)
+FNCALL_TEMPLATE_TOKENS = int(os.environ.get('FNCALL_TEMPLATE_TOKENS', 300))
+
+
+def system_prompt_tokens(users, trip_id=None):
+    """Tokens taken before the chat (system prompt, tool descriptions and their template), the rest of the context budget is for the chat."""
+    return count_tokens(prompt_prefix(get_bot(users, trip_id))) + FNCALL_TEMPLATE_TOKENS
+
+
+# Prompt prefix of the last turn of each trip, to see how often the model server can reuse its cache
+_prefix_fingerprints = OrderedDict()  # trip_id -> fingerprint
+_prefix_stats = {"turns": 0, "prefix_reused": 0, "prefix_changed": 0, "prefix_new": 0}
+_prefix_lock = threading.Lock()
+
+
+def record_prefix(trip_id, bot):
+    """Compare the turn's prompt prefix with the trip's previous turn and count the outcome."""
+    fingerprint = prefix_fingerprint(bot)
+    with _prefix_lock:
+        previous = _prefix_fingerprints.pop(trip_id, None)
+        _prefix_fingerprints[trip_id] = fingerprint
+        while len(_prefix_fingerprints) > AGENT_CACHE_SIZE:
+            _prefix_fingerprints.popitem(last=False)
+        _prefix_stats["turns"] += 1
+        if previous is None:
+            _prefix_stats["prefix_new"] += 1
+        elif previous == fingerprint:
+            _prefix_stats["prefix_reused"] += 1
+        else:
+            _prefix_stats["prefix_changed"] += 1
+    print(f"Prompt prefix for trip {trip_id}: {fingerprint} ({'new' if previous is None else 'reused' if previous == fingerprint else 'changed'})")
+    return fingerprint
+
+
+def prompt_metrics():
+    """How often a trip's turn started with the same prompt prefix as its previous turn."""
+    with _prefix_lock:
+        snapshot = dict(_prefix_stats)
+    seen = snapshot["prefix_reused"] + snapshot["prefix_changed"]
+    snapshot["prefix_reuse_rate"] = round(snapshot["prefix_reused"] / seen, 3) if seen else None
+    return snapshot
+
+
+# Streaming deltas are batched into one 'update' event per window or per this many bytes
+STREAM_FLUSH_MS = float(os.environ.get('STREAM_FLUSH_MS', 40))
+STREAM_FLUSH_BYTES = int(os.environ.get('STREAM_FLUSH_BYTES', 1024))
+
+
+class StreamCoalescer:
+    """
+    Buffers text deltas of one streamed message and emits them as a single
+    'update' event once STREAM_FLUSH_MS have passed since the first buffered
+    delta, or as soon as STREAM_FLUSH_BYTES are waiting.
+
+    A delta arriving after the window sends the batch right from push(). One
+    flusher thread per stream sends it when the stream stalls instead, and
+    exits once nothing has been buffered for idle_s.
+    """
+
+    def __init__(self, socketio, trip_id, message_id,
+                 window_ms=STREAM_FLUSH_MS, max_bytes=STREAM_FLUSH_BYTES, idle_s=1.0):
+        self.socketio = socketio
+        self.trip_id = trip_id
+        self.message_id = message_id
+        self.window = window_ms / 1000
+        self.max_bytes = max_bytes
+        self.idle = idle_s
+        self._buffer = []
+        self._size = 0
+        self._first_at = None
+        self._flusher = None
+        self._cond = threading.Condition()
+
+    def push(self, text):
+        if not text:
+            return
+        with self._cond:
+            now = time.monotonic()
+            if not self._buffer:
+                # first delta of a batch starts the clock
+                self._first_at = now
+                self._cond.notify()
+            self._buffer.append(text)
+            self._size += len(text.encode())
+            if self._size >= self.max_bytes or now - self._first_at >= self.window:
+                self._emit()
+            elif self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_stalled, daemon=True)
+                self._flusher.start()
+
+    def _flush_stalled(self):
+        with self._cond:
+            while True:
+                if not self._buffer:
+                    if not self._cond.wait(self.idle) and not self._buffer:
+                        self._flusher = None
+                        return
+                    continue
+                delay = self._first_at + self.window - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                else:
+                    self._emit()
+
+    def discard(self):
+        """Drop whatever is buffered without sending it."""
+        with self._cond:
+            self._buffer = []
+            self._size = 0
+
+    def flush(self):
+        with self._cond:
+            self._emit()
+
+    def _emit(self):
+        # called with the lock held, so batches can't overtake each other
+        if not self._buffer:
+            return
+        content = ''.join(self._buffer)
+        self._buffer = []
+        self._size = 0
+        self.socketio.emit('message_stream', {
+            'type': 'update',
+            'message_id': self.message_id,
+            'content': content,
+            'trip_id': self.trip_id
+        }, room=f'trip_{self.trip_id}')
+
+
+class ResponseDeltaExtractor:
+    """
+    Turns the growing message list yielded by bot.run() into only the new text,
+    rendered the same way as qwen's typewriter_print but without re-rendering or
+    diffing the whole response on every chunk.
+
+    Earlier messages are final once a later one shows up, so only the last
+    message is looked at, and for each of its fields we remember how much has
+    already been emitted.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._msg_index = 0
+        self._emitted = {}  # field -> characters of its value already emitted
+        self._tool_call = None
+
+    @staticmethod
+    def _fields(msg):
+        if msg['role'] == ASSISTANT:
+            function_call = msg.get('function_call') or {}
+            return [
+                ('reasoning_content', f'{THOUGHT_S}\n', msg.get('reasoning_content')),
+                ('content', f'{ANSWER_S}\n', msg.get('content')),
+                ('function_call', f'{TOOL_CALL_S} {function_call.get("name")}\n', function_call.get('arguments')),
+            ]
+        if msg['role'] == FUNCTION:
+            return [('content', f'{TOOL_RESULT_S} {msg.get("name")}\n', msg.get('content'))]
+        return []
+
+    def feed(self, messages):
+        """
+        Yields ('text', new_text) for newly rendered text, ('tool_call', function_call) once
+        a tool call is complete and ('tool_result', message) when a tool answer arrives.
+        """
+        for i in range(self._msg_index, len(messages)):
+            msg = messages[i]
+            if i > self._msg_index:
+                # the previous message is finished
+                if self._tool_call:
+                    yield 'tool_call', self._tool_call
+                self._msg_index = i
+                self._emitted = {}
+                self._tool_call = None
+                if msg['role'] == FUNCTION:
+                    yield 'tool_result', msg
+
+            if msg['role'] == ASSISTANT and msg.get('function_call'):
+                self._tool_call = msg['function_call']
+
+            for field, prefix, value in self._fields(msg):
+                if not value or not isinstance(value, str):
+                    continue
+                done = self._emitted.get(field)
+                if done is None:
+                    text = ('\n' if self._chunks else '') + prefix + value
+                elif len(value) > done:
+                    text = value[done:]
+                else:
+                    continue
+                self._emitted[field] = len(value)
+                self._chunks.append(text)
+                yield 'text', text
+
+    def finish(self):
+        """Flush a trailing tool call, if the run ended on one."""
+        if self._tool_call:
+            yield 'tool_call', self._tool_call
+            self._tool_call = None
+
+    @property
+    def text(self):
+        return ''.join(self._chunks)
+
+
+def get_ai_message(users, messages, socketio=None, trip_id=None, cancel_event=None):
+    """
+    Run the trip's bot on the conversation and stream the answer to the trip's room.
+    Returns the full answer, or None if cancel_event got set (a newer message
+    superseded this one), in which case clients get a 'cancel' event instead of 'end'.
+    """
+    bot = get_bot(users, trip_id)
+    if trip_id:
+        record_prefix(trip_id, bot)
     
     # Generate a unique message ID for streaming
     from uuid import uuid4
@@ -25,25 +279,33 @@ def get_ai_message(users, messages, socketio=None, trip_id=None):
             'message_id': message_id,
             'trip_id': trip_id
         }, room=f'trip_{trip_id}')
+        stream = StreamCoalescer(socketio, trip_id, message_id)
     
-    # Collect all characters from the response
+    # Collect only the new text of each chunk
+    deltas = ResponseDeltaExtractor()
     for response in bot.run(messages=messages):
-        # Get the new characters
-        old_text = response_plain_text
-        response_plain_text = typewriter_print(response, response_plain_text)
-        new_text = response_plain_text[len(old_text):]
-        
-        # Emit streaming update if socketio is available
-        if socketio and trip_id and new_text:
+        if cancel_event is not None and cancel_event.is_set():
+            break
+        for kind, payload in deltas.feed(response):
+            # Emit streaming update if socketio is available
+            if kind == 'text' and socketio and trip_id:
+                stream.push(payload)
+    response_plain_text = deltas.text
+
+    if cancel_event is not None and cancel_event.is_set():
+        if socketio and trip_id:
+            stream.discard()
             socketio.emit('message_stream', {
-                'type': 'update',
+                'type': 'cancel',
                 'message_id': message_id,
-                'content': new_text,
                 'trip_id': trip_id
             }, room=f'trip_{trip_id}')
+        return None
     
     # Emit completion event if socketio is available
     if socketio and trip_id:
+        # whatever is still buffered has to go out before 'end'
+        stream.flush()
         socketio.emit('message_stream', {
             'type': 'end',
             'message_id': message_id,
@@ -0,0 +1,183 @@
+"""Bounded prompt context for AI turns.
+
+Each trip keeps a rolling summary of its older messages (Trip.summary). The
+prompt for a turn is the bot's system prompt, the summary and then as many of
+the newest messages as fit in AI_CONTEXT_TOKENS (layout in agent/prompt.py),
+so prompt size stays flat no matter how long the chat gets. After each AI turn, messages that have fallen
+behind the most recent AI_SUMMARY_KEEP_RECENT are folded into the summary.
+"""
+
+import os
+import re
+from typing import List, NamedTuple, Optional
+from sqlalchemy import and_, desc, select
+from qwen_agent.llm import get_chat_model
+from qwen_agent.utils.tokenization_qwen import count_tokens, tokenizer
+
+from agent.agent import llm_cfg
+from agent.prompt import context_message
+from backend.models import Message, Profile, Trip, User
+
+AI_CONTEXT_TOKENS = int(os.environ.get("AI_CONTEXT_TOKENS", 8000))  # system prompt + summary + messages
+AI_CONTEXT_MAX_MESSAGES = int(os.environ.get("AI_CONTEXT_MAX_MESSAGES", 50))  # messages loaded per turn
+AI_MESSAGE_MAX_TOKENS = int(os.environ.get("AI_MESSAGE_MAX_TOKENS", 1000))  # longer messages get cut
+AI_SUMMARY_MAX_TOKENS = int(os.environ.get("AI_SUMMARY_MAX_TOKENS", 600))
+AI_SUMMARY_KEEP_RECENT = int(os.environ.get("AI_SUMMARY_KEEP_RECENT", 10))  # newest messages stay verbatim
+AI_SUMMARY_BATCH = int(os.environ.get("AI_SUMMARY_BATCH", 6))  # fold once this many older messages wait
+
+# per-message overhead of the chat template (role markers, newlines)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PROMPT = (
+    "You keep the running summary of a group chat where friends plan a trip with an AI assistant. "
+    "Update the summary with the new messages. Keep decisions, preferences, constraints, dates, "
+    "destinations and prices that were agreed on or rejected, and who said what when it matters. "
+    f"Drop small talk. Answer with the updated summary only, at most {AI_SUMMARY_MAX_TOKENS} tokens."
+)
+
+_summary_llm = None
+
+
+class ChatMessage(NamedTuple):
+    id: int
+    is_ai: bool
+    content: str
+    sender_name: Optional[str]
+
+
+class TripContext(NamedTuple):
+    """Everything an AI turn needs from the database."""
+    trip_id: int
+    name: str
+    summary: Optional[str]
+    summary_message_id: Optional[int]
+    users: List[dict]  # active members in profile order: name, questions, nearest_airport
+    messages: List[ChatMessage]  # newest messages not in the summary yet, oldest first
+
+
+def nearest_airports(questions):
+    """Airport codes answered in a profile's questions."""
+    airports = []
+    for question in questions or []:
+        # Check for airport-related questions
+        if isinstance(question, dict) and 'question' in question:
+            question_text = question.get('question', '').lower()
+            if ('airport' in question_text or 'icao' in question_text) and 'answer' in question:
+                airport_code = question.get('answer')
+                if airport_code and len(airport_code.strip()) > 0:
+                    airports.append(airport_code.strip()[1:])
+    return airports
+
+
+def load_messages(session, trip_id, after_id=None, limit=None, offset=0):
+    """
+    Messages of a trip newer than after_id with their sender's name, oldest first.
+    limit/offset count back from the newest message.
+    """
+    query = (
+        select(Message.id, Message.is_ai, Message.content, User.name)
+        .outerjoin(Profile, Profile.id == Message.profile_id)
+        .outerjoin(User, User.id == Profile.user_id)
+        .where(Message.trip_id == trip_id, Message.id > (after_id or 0))
+        .order_by(desc(Message.created_at), desc(Message.id))
+        .offset(offset)
+    )
+    if limit is not None:
+        query = query.limit(limit)
+    return [ChatMessage(*row) for row in reversed(session.execute(query).all())]
+
+
+def load_trip_context(session, trip_id, max_messages=AI_CONTEXT_MAX_MESSAGES):
+    """
+    Trip, active members and recent messages in two queries, selecting only the
+    columns the prompt uses. Returns None if the trip doesn't exist.
+    """
+    rows = session.execute(
+        select(Trip.name, Trip.summary, Trip.summary_message_id, Profile.questions, User.name)
+        .outerjoin(Profile, and_(Profile.trip_id == Trip.id, Profile.deleted == False))
+        .outerjoin(User, User.id == Profile.user_id)
+        .where(Trip.id == trip_id)
+        # fixed order so the users in the prompt stay the same from turn to turn
+        .order_by(Profile.id)
+    ).all()
+    if not rows:
+        return None
+
+    name, summary, summary_message_id = rows[0][:3]
+    users = []
+    for _, _, _, questions, user_name in rows:
+        if user_name is None:
+            continue  # trip without active members
+        users.append({
+            "name": user_name,
+            "questions": [
+                {k: q[k] for k in ("question", "answer") if k in q} if isinstance(q, dict) else q
+                for q in questions or []
+            ],
+            "nearest_airport": nearest_airports(questions),
+        })
+
+    messages = load_messages(session, trip_id, after_id=summary_message_id, limit=max_messages)
+    return TripContext(trip_id, name, summary, summary_message_id, users, messages)
+
+
+def format_message(msg):
+    """ChatMessage -> chat message for the bot."""
+    if msg.is_ai:
+        return {"role": "assistant", "content": msg.content}
+    return {"role": "user", "content": f"{msg.sender_name or 'Unknown'}: {msg.content}"}
+
+
+def truncate_tokens(text, max_tokens):
+    if count_tokens(text) <= max_tokens:
+        return text
+    return tokenizer.truncate(text, max_token=max_tokens) + " [...]"
+
+
+def build_context(summary, messages, budget):
+    """
+    Chat messages for one AI turn within `budget` tokens.
+
+    Args:
+        summary: the trip's rolling summary, or None
+        messages: formatted messages newer than the summary, oldest first
+        budget: tokens left once the system prompt is accounted for
+
+    The newest messages are kept first; the newest one is always included. The date and
+    summary go in a context message in front of them, after the bot's stable prompt prefix.
+    """
+    preamble = context_message(summary)
+    budget -= count_tokens(preamble["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+    picked = []
+    for msg in reversed(messages):
+        content = truncate_tokens(msg["content"], AI_MESSAGE_MAX_TOKENS)
+        cost = count_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+        if cost > budget and picked:
+            break
+        budget -= cost
+        picked.append(dict(msg, content=content))
+    picked.reverse()
+    return [preamble] + picked
+
+
+def summarize(summary, messages):
+    """Fold formatted messages (oldest first) into the summary with one LLM call."""
+    global _summary_llm
+    if _summary_llm is None:
+        _summary_llm = get_chat_model(llm_cfg)
+
+    transcript = "\n".join(
+        ("Assistant: " if msg["role"] == "assistant" else "") + truncate_tokens(msg["content"], AI_MESSAGE_MAX_TOKENS)
+        for msg in messages
+    )
+    prompt = f"Current summary:\n{summary or '(empty)'}\n\nNew messages:\n{transcript}"
+    response = _summary_llm.chat(messages=[
+        {"role": "system", "content": SUMMARY_PROMPT},
+        {"role": "user", "content": prompt},
+    ], stream=False)
+
+    text = response[-1]["content"] if response else ""
+    # qwen3 may think out loud before answering
+    text = re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL).strip()
+    return truncate_tokens(text, AI_SUMMARY_MAX_TOKENS) if text else summary
@@ -0,0 +1,184 @@
+"""Bounded executor for AI generations.
+
+A fixed pool of worker threads runs the jobs; each trip has its own FIFO so only
+one generation per trip runs at a time, and queues are capped so a burst of
+messages gets rejected instead of piling up LLM requests.
+
+Chat messages go through submit_debounced: a burst of messages in the same trip
+becomes a single generation, and a newer message cancels the trip's generation
+that is still running or waiting.
+"""
+
+import os
+import time
+import threading
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+AI_WORKERS = int(os.environ.get("AI_WORKERS", 4))
+AI_MAX_PENDING = int(os.environ.get("AI_MAX_PENDING", 100))
+AI_MAX_PENDING_PER_TRIP = int(os.environ.get("AI_MAX_PENDING_PER_TRIP", 5))
+AI_DEBOUNCE_MS = float(os.environ.get("AI_DEBOUNCE_MS", 1500))
+
+
+class QueueFullError(Exception):
+    """Raised when a job can't be queued because a queue-depth limit was hit."""
+
+
+class AIJobExecutor:
+    """Runs jobs on a fixed worker pool, one at a time per trip, in submission order."""
+
+    def __init__(self, max_workers=AI_WORKERS, max_pending=AI_MAX_PENDING,
+                 max_pending_per_trip=AI_MAX_PENDING_PER_TRIP):
+        self.max_pending = max_pending
+        self.max_pending_per_trip = max_pending_per_trip
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ai-worker")
+        self._lock = threading.Lock()
+        self._queues = {}  # trip_id -> deque of (enqueued_at, fn, args, cancel_event) waiting for their turn
+        self._active = set()  # trips with a job handed to the pool
+        self._running_cancel = {}  # trip_id -> cancel event of the job handed to the pool (waiting for a worker or running)
+        self._debounce = {}  # trip_id -> Timer of a debounced job not queued yet
+        self._pending = 0  # jobs submitted but not started yet
+        self._waits = deque(maxlen=1000)  # recent queue wait times in seconds
+        self._counters = {"submitted": 0, "rejected": 0, "started": 0, "completed": 0, "failed": 0,
+                          "debounced": 0, "superseded": 0}
+
+    def submit(self, trip_id, fn, *args, cancel_event=None):
+        """
+        Queue fn(*args) behind the trip's other jobs. Raises QueueFullError when over a limit.
+        Setting cancel_event drops the job if it hasn't started yet.
+        """
+        with self._lock:
+            queue = self._queues.get(trip_id)
+            if self._pending >= self.max_pending or (queue is not None and len(queue) >= self.max_pending_per_trip):
+                self._counters["rejected"] += 1
+                raise QueueFullError(f"AI queue full for trip {trip_id}")
+
+            # only created once the job is accepted, _start_next removes it when it runs empty
+            self._queues.setdefault(trip_id, deque()).append((time.monotonic(), fn, args, cancel_event))
+            self._pending += 1
+            self._counters["submitted"] += 1
+            if trip_id not in self._active:
+                self._start_next(trip_id)
+
+    def submit_debounced(self, trip_id, fn, *args, delay=None, on_rejected=None):
+        """
+        Run fn(*args, cancel_event) once the trip has been quiet for `delay` seconds
+        (AI_DEBOUNCE_MS by default); another call within the window replaces this one.
+        Any generation the trip has running or queued is superseded right away: its
+        cancel_event is set and queued jobs are dropped.
+        Raises QueueFullError if the queue is already full; if it fills up during the
+        quiet period instead, on_rejected(error) is called from the timer thread.
+        """
+        delay = AI_DEBOUNCE_MS / 1000 if delay is None else delay
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._counters["rejected"] += 1
+                raise QueueFullError(f"AI queue full for trip {trip_id}")
+
+            timer = self._debounce.pop(trip_id, None)
+            if timer is not None:
+                timer.cancel()
+                self._counters["debounced"] += 1
+            self._supersede(trip_id)
+
+            timer = threading.Timer(delay, self._fire_debounced, (trip_id, fn, args, on_rejected))
+            timer.daemon = True
+            self._debounce[trip_id] = timer
+            timer.start()
+
+    def _fire_debounced(self, trip_id, fn, args, on_rejected):
+        with self._lock:
+            if self._debounce.get(trip_id) is not threading.current_thread():
+                return  # replaced by a newer message in the meantime
+            del self._debounce[trip_id]
+        cancel_event = threading.Event()
+        try:
+            self.submit(trip_id, fn, *args, cancel_event, cancel_event=cancel_event)
+        except QueueFullError as e:
+            print(e)
+            if on_rejected is not None:
+                on_rejected(e)
+
+    def _supersede(self, trip_id):
+        # caller holds the lock
+        cancel_event = self._running_cancel.get(trip_id)
+        if cancel_event is not None and not cancel_event.is_set():
+            cancel_event.set()
+            self._counters["superseded"] += 1
+
+        queue = self._queues.get(trip_id)
+        if queue:
+            kept = deque(job for job in queue if job[3] is None)
+            dropped = len(queue) - len(kept)
+            for job in queue:
+                if job[3] is not None:
+                    job[3].set()
+            self._queues[trip_id] = kept
+            self._pending -= dropped
+            self._counters["superseded"] += dropped
+
+    def _start_next(self, trip_id):
+        # caller holds the lock
+        queue = self._queues.get(trip_id)
+        if not queue:
+            self._queues.pop(trip_id, None)
+            self._active.discard(trip_id)
+            return
+        enqueued_at, fn, args, cancel_event = queue.popleft()
+        self._active.add(trip_id)
+        # reachable by _supersede from now on, also while it waits for a free worker
+        if cancel_event is not None:
+            self._running_cancel[trip_id] = cancel_event
+        self._pool.submit(self._run, trip_id, enqueued_at, fn, args, cancel_event)
+
+    def _run(self, trip_id, enqueued_at, fn, args, cancel_event):
+        with self._lock:
+            self._pending -= 1
+            # superseded while waiting for a worker, _supersede already counted it
+            skipped = cancel_event is not None and cancel_event.is_set()
+            if not skipped:
+                self._counters["started"] += 1
+                self._waits.append(time.monotonic() - enqueued_at)
+
+        try:
+            if not skipped:
+                fn(*args)
+        except Exception as e:
+            print(f"AI job for trip {trip_id} failed: {e}")
+            traceback.print_exc()
+            with self._lock:
+                self._counters["failed"] += 1
+        finally:
+            with self._lock:
+                if not skipped:
+                    self._counters["completed"] += 1
+                self._running_cancel.pop(trip_id, None)
+                self._start_next(trip_id)
+
+    def metrics(self):
+        """Snapshot of counters, queue depth and queue wait times (ms)."""
+        with self._lock:
+            waits = sorted(self._waits)
+            snapshot = dict(self._counters)
+            snapshot["pending"] = self._pending
+            snapshot["active_trips"] = len(self._active)
+            snapshot["debouncing_trips"] = len(self._debounce)
+
+        def percentile(p):
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))] * 1000, 2) if waits else None
+
+        snapshot["wait_ms"] = {
+            "p50": percentile(0.5),
+            "p95": percentile(0.95),
+            "max": round(waits[-1] * 1000, 2) if waits else None,
+        }
+        return snapshot
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+
+# Shared executor for the whole app
+ai_jobs = AIJobExecutor()
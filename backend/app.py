@@ -1,4 +1,5 @@
 """Main Flask application."""
+import json
 from flask import Flask, jsonify, request
 from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
@@ -11,11 +12,50 @@ from backend.routes import blueprints
 # Initialize SocketIO instance at module level
 socketio = SocketIO()
 
+try:
+    import orjson  # much faster dumps/loads, from the fast-json extra
+except ImportError:
+    orjson = None
+
 class MyJsonEncoder(DefaultJSONProvider):
-    def default(self, obj):
+    """
+    Flask's JSON provider, using orjson when it's installed. Output is compact
+    (no pretty printing or key sorting, in debug too): clients don't care and it's
+    a good part of the encoding time. Models are encoded with their to_dict() and
+    datetimes in the same HTTP date format as Flask's default provider.
+    """
+    sort_keys = False
+    compact = True
+
+    @staticmethod
+    def default(obj):
         if hasattr(obj, 'to_dict'):
             return obj.to_dict()
-        return super().default(obj)
+        return DefaultJSONProvider.default(obj)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            kwargs.setdefault("default", self.default)
+            kwargs.setdefault("separators", (",", ":"))
+            kwargs.setdefault("ensure_ascii", self.ensure_ascii)
+            return json.dumps(obj, **kwargs)
+        return self._dumps_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return json.loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def _dumps_bytes(self, obj):
+        if orjson is None:
+            return self.dumps(obj).encode()
+        # datetimes go through default() so they keep Flask's format
+        return orjson.dumps(obj, default=self.default,
+                            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._dumps_bytes(obj) + b"\n", mimetype=self.mimetype)
 
 def create_app():
     """Create and configure the Flask application."""
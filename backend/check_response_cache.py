@@ -0,0 +1,138 @@
+"""Checks that the write routes invalidate the response cache keys they should.
+
+Runs the real routes with Flask's test client on a throwaway SQLite database, with
+the response cache on RedisBackend over FakeRedis (an in-memory stand-in for a
+Redis server), and checks which `me:` / `trip:` keys each write bumps:
+
+- create-trip               -> me:<creator>
+- join-trip / leave-trip    -> trip:<id> and me:<every member of the trip>
+- send-message              -> trip:<id>:messages
+
+and that reads after a write see the change while repeated reads are cache hits.
+
+    python -m backend.check_response_cache
+"""
+import os
+import sys
+import tempfile
+
+# no Postgres needed, and no AI answer fires while the check runs
+_db_file = tempfile.NamedTemporaryFile(suffix='.sqlite', delete=False)
+os.environ['DATABASE_URL'] = f"sqlite:///{_db_file.name}"
+os.environ['AI_DEBOUNCE_MS'] = str(3600 * 1000)
+
+import threading
+import time
+
+from flask import Flask
+from flask_socketio import SocketIO
+
+from backend.db import Base, engine, shutdown_session
+from backend.routes import blueprints
+from backend.response_cache import RedisBackend, response_cache
+
+
+class FakeRedis:
+    """The part of redis.Redis that RedisBackend uses: get, set with ex, incr. Values come back as bytes."""
+
+    def __init__(self):
+        self._data = {}  # key -> (expires_at or None, bytes)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or (entry[0] is not None and entry[0] <= time.monotonic()):
+                self._data.pop(key, None)
+                return None
+            return entry[1]
+
+    def set(self, key, value, ex=None):
+        value = value if isinstance(value, bytes) else str(value).encode()
+        with self._lock:
+            self._data[key] = (None if ex is None else time.monotonic() + ex, value)
+
+    def incr(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            value = int(entry[1]) + 1 if entry else 1
+            self._data[key] = (None, str(value).encode())
+            return value
+
+
+def make_app():
+    app = Flask(__name__)
+    for blueprint in blueprints:
+        app.register_blueprint(blueprint)
+    app.teardown_appcontext(shutdown_session)
+    SocketIO(app)
+    return app
+
+
+def versions(backend, *keys):
+    return {key: backend.version(f"{key}:v") for key in keys}
+
+
+def main():
+    Base.metadata.create_all(engine)
+    backend = RedisBackend(client=FakeRedis())
+    response_cache.backend = backend
+
+    app = make_app()
+    ann, bob = app.test_client(), app.test_client()
+    failures = []
+
+    def check(name, ok):
+        print(f"{'ok  ' if ok else 'FAIL'} {name}")
+        if not ok:
+            failures.append(name)
+
+    def bumped(before, after):
+        return sorted(key for key in after if after[key] != before[key])
+
+    keys = ('me:1', 'me:2', 'trip:1', 'trip:1:messages')
+
+    before = versions(backend, *keys)
+    ann.post('/api/create-trip', json={'name': 'ann', 'trip_name': 'Lisbon', 'questions': []})
+    ann.set_cookie('user_id', '1')
+    check("create-trip bumps me:<creator>", bumped(before, versions(backend, *keys)) == ['me:1'])
+
+    ann.get('/api/me')
+    ann.get('/api/trip-info?trip_id=1')
+    hits = response_cache.metrics()['hits']
+    me = ann.get('/api/me').json
+    ann.get('/api/trip-info?trip_id=1')
+    check("repeated reads are cache hits", response_cache.metrics()['hits'] == hits + 3)
+
+    before = versions(backend, *keys)
+    bob.post('/api/join-trip', json={'trip_id': 1, 'name': 'bob', 'questions': []})
+    bob.set_cookie('user_id', '2')
+    check("join-trip bumps trip:<id> and me:<every member>",
+          bumped(before, versions(backend, *keys)) == ['me:1', 'me:2', 'trip:1'])
+    me = ann.get('/api/me').json
+    check("/api/me sees the new member", [u['name'] for u in me['trips'][0]['users']] == ['ann', 'bob'])
+
+    before = versions(backend, *keys)
+    ann.post('/api/send-message', json={'trip_id': 1, 'content': 'hello'})
+    check("send-message bumps trip:<id>:messages", bumped(before, versions(backend, *keys)) == ['trip:1:messages'])
+    info = ann.get('/api/trip-info?trip_id=1').json
+    check("/api/trip-info sees the new message", [m['content'] for m in info['trip']['messages']] == ['hello'])
+
+    before = versions(backend, *keys)
+    bob.post('/api/leave-trip', json={'trip_id': 1})
+    check("leave-trip bumps trip:<id> and me:<every member>",
+          bumped(before, versions(backend, *keys)) == ['me:1', 'me:2', 'trip:1'])
+    info = ann.get('/api/trip-info?trip_id=1').json
+    check("/api/trip-info drops the member who left", [u['name'] for u in info['trip']['users']] == ['ann'])
+
+    print(response_cache.metrics())
+    engine.dispose()
+    os.unlink(_db_file.name)
+    if failures:
+        print(f"FAILED: {', '.join(failures)}")
+        sys.exit(1)
+    print("All response cache checks passed.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""Versioned database migrations.
+
+Migrations run in order at startup and each applied version is recorded in
+the schema_version table, so a schema change is a new entry in MIGRATIONS
+instead of a reset of the whole database. Every step must be idempotent
+(IF NOT EXISTS and friends): a migration that died halfway is simply run
+again on the next start.
+
+Steps are SQL strings (or functions taking a connection) run together in one
+transaction with the version bookkeeping. Concurrently(...) marks statements
+Postgres refuses to run in a transaction, like CREATE INDEX CONCURRENTLY, which
+builds an index without blocking writes to the table; a migration containing
+one runs every step on its own in autocommit mode and is recorded at the end.
+"""
+
+from sqlalchemy import inspect, text
+
+# Any constant works, it just has to be the same for every process running migrations
+MIGRATIONS_LOCK_ID = 725001
+
+
+class Concurrently:
+    """A step run outside any transaction (autocommit)."""
+
+    def __init__(self, sql):
+        self.sql = sql
+
+
+def create_index_concurrently(name, table, columns, where=None):
+    """
+    Steps building an index without locking the table for writes.
+    A failed concurrent build leaves an INVALID index behind that IF NOT EXISTS
+    would happily skip, so that one is dropped first.
+    """
+    drop_invalid = f"""
+        DO $$
+        BEGIN
+            IF EXISTS (
+                SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE c.relname = '{name}' AND NOT i.indisvalid
+            ) THEN
+                EXECUTE 'DROP INDEX {name}';
+            END IF;
+        END $$;
+    """
+    create = f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"
+    if where:
+        create += f" WHERE {where}"
+    return [Concurrently(drop_invalid), Concurrently(create)]
+
+
+# (version, name, steps) in the order they are applied. Never edit or reorder an
+# applied migration, add a new one instead.
+MIGRATIONS = [
+    # the schema as it was before migrations existed, spelled out rather than taken from
+    # the models so later model changes stay in their own migrations
+    (1, "initial tables", [
+        """
+        CREATE TABLE IF NOT EXISTS trips (
+            id SERIAL NOT NULL,
+            name VARCHAR NOT NULL,
+            PRIMARY KEY (id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id SERIAL NOT NULL,
+            name VARCHAR NOT NULL,
+            PRIMARY KEY (id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS profiles (
+            id SERIAL NOT NULL,
+            trip_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            questions JSON NOT NULL,
+            deleted BOOLEAN NOT NULL,
+            PRIMARY KEY (id),
+            FOREIGN KEY (trip_id) REFERENCES trips (id),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS messages (
+            id SERIAL NOT NULL,
+            trip_id INTEGER NOT NULL,
+            profile_id INTEGER,
+            content VARCHAR NOT NULL,
+            is_ai BOOLEAN NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            PRIMARY KEY (id),
+            FOREIGN KEY (trip_id) REFERENCES trips (id),
+            FOREIGN KEY (profile_id) REFERENCES profiles (id)
+        )
+        """,
+    ]),
+    (2, "trip conversation summary", [
+        "ALTER TABLE trips ADD COLUMN IF NOT EXISTS summary VARCHAR",
+        "ALTER TABLE trips ADD COLUMN IF NOT EXISTS summary_message_id INTEGER",
+    ]),
+    (3, "indexes for chat history and trip members", [
+        *create_index_concurrently("ix_messages_trip_id_created_at", "messages", ["trip_id", "created_at"]),
+        *create_index_concurrently("ix_profiles_trip_id_user_id", "profiles", ["trip_id", "user_id"]),
+        *create_index_concurrently("ix_profiles_active_trip_id", "profiles", ["trip_id"], where="deleted = false"),
+    ]),
+]
+
+
+def ensure_version_table(conn):
+    """Create schema_version, replacing the old single-row schema hash table if it's still there."""
+    inspector = inspect(conn)
+    if "schema_version" in inspector.get_table_names():
+        columns = {column["name"] for column in inspector.get_columns("schema_version")}
+        if "applied_at" in columns:
+            return
+        # the old table only held a hash of the models
+        conn.execute(text("DROP TABLE schema_version"))
+        print("Replaced the old schema hash table with versioned migrations.")
+
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT now()
+        )
+    """))
+
+
+def applied_versions(conn):
+    return {row[0] for row in conn.execute(text("SELECT version FROM schema_version"))}
+
+
+def run_step(conn, step):
+    if isinstance(step, Concurrently):
+        conn.execute(text(step.sql))
+    elif callable(step):
+        step(conn)
+    else:
+        conn.execute(text(step))
+
+
+def apply_migration(engine, version, name, steps):
+    record = text("INSERT INTO schema_version (version, name) VALUES (:version, :name)")
+    if any(isinstance(step, Concurrently) for step in steps):
+        # no transaction may stay open here: concurrent index builds wait for older transactions to finish
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            for step in steps:
+                run_step(conn, step)
+            conn.execute(record, {"version": version, "name": name})
+    else:
+        with engine.begin() as conn:
+            for step in steps:
+                run_step(conn, step)
+            conn.execute(record, {"version": version, "name": name})
+
+
+def run_migrations(engine):
+    """Apply every migration not recorded in schema_version yet. Returns the versions applied."""
+    applied_now = []
+    # one process migrates at a time, the others wait and then find nothing to do.
+    # The lock is session level, so its connection doesn't need (or keep) a transaction open.
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as lock_conn:
+        lock_conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATIONS_LOCK_ID})
+        try:
+            with engine.begin() as conn:
+                ensure_version_table(conn)
+                done = applied_versions(conn)
+
+            for version, name, steps in MIGRATIONS:
+                if version in done:
+                    continue
+                print(f"Applying migration {version}: {name}")
+                apply_migration(engine, version, name, steps)
+                applied_now.append(version)
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATIONS_LOCK_ID})
+
+    if applied_now:
+        print(f"Database migrated to version {applied_now[-1]}.")
+    else:
+        print("Database schema up to date.")
+    return applied_now
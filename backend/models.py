@@ -2,7 +2,7 @@
 
 from typing import List, Optional, Dict, Any
 from datetime import datetime
-from sqlalchemy import String, ForeignKey, JSON, Boolean, DateTime, Integer, inspect
+from sqlalchemy import String, ForeignKey, JSON, Boolean, DateTime, Integer, Index, inspect, text
 from sqlalchemy.orm import DeclarativeBase, MappedAsDataclass, relationship, Mapped, mapped_column
 from sqlalchemy.sql import func
 from sqlalchemy_serializer import SerializerMixin
@@ -45,6 +45,9 @@ class Trip(Base):
 
     id: Mapped[int] = mapped_column(primary_key=True, )
     name: Mapped[str] = mapped_column(String, nullable=False)
+    # rolling summary of the chat used as AI context, covers messages up to summary_message_id
+    summary: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    summary_message_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
 
     profiles: Mapped[List["Profile"]] = relationship(
         back_populates="trip", cascade="all, delete-orphan", 
@@ -71,6 +74,11 @@ class Profile(Base):
     """Profile model representing a user's profile for a specific trip with questions/answers."""
 
     __tablename__ = "profiles"
+    # also created on existing databases by migration 3 in backend/migrations.py
+    __table_args__ = (
+        Index("ix_profiles_trip_id_user_id", "trip_id", "user_id"),
+        Index("ix_profiles_active_trip_id", "trip_id", postgresql_where=text("deleted = false")),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, )
     trip_id: Mapped[int] = mapped_column(ForeignKey("trips.id"), nullable=False)
@@ -93,6 +101,10 @@ class Message(Base):
     """Message model representing a message in a trip."""
 
     __tablename__ = "messages"
+    # also created on existing databases by migration 3 in backend/migrations.py
+    __table_args__ = (
+        Index("ix_messages_trip_id_created_at", "trip_id", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, )
     trip_id: Mapped[int] = mapped_column(ForeignKey("trips.id"), nullable=False)
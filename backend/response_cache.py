@@ -0,0 +1,162 @@
+"""Read-through cache for the read-heavy endpoints: /api/me and /api/trip-info.
+
+Responses are cached per user (/api/me) and per trip (/api/trip-info: members
+and, separately, the latest page of messages) and dropped by the write routes
+that change them:
+
+- create-trip               -> me:<creator>
+- join-trip / leave-trip    -> trip:<id> and me:<every member of the trip>
+- send-message, AI answers  -> trip:<id>:messages
+
+Invalidation bumps a version number kept next to the key instead of deleting
+the value, so a read that loaded data just before a write can't put its stale
+result back afterwards: it is stored under the old version, which nobody reads.
+
+The store is pluggable. By default it lives in the process (one per worker);
+RESPONSE_CACHE_URL=redis://... shares it between workers. Anything with
+get/set/incr/version works as a backend; RedisBackend also takes any client with
+redis' get/set/incr, which is how backend/check_response_cache.py runs the
+invalidations through it without a Redis server.
+"""
+
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+
+RESPONSE_CACHE_TTL = int(os.environ.get("RESPONSE_CACHE_TTL", 300))  # safety net for writes we don't see
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", 2048))
+RESPONSE_CACHE_URL = os.environ.get("RESPONSE_CACHE_URL", "")  # '' = in process
+
+
+class InProcessBackend:
+    """LRU + TTL store for one process. Version counters are kept apart and never evicted."""
+
+    def __init__(self, maxsize=RESPONSE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._values = OrderedDict()  # key -> (expires_at, value)
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._values[key]
+                return None
+            self._values.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._values[key] = (time.monotonic() + ttl, value)
+            self._values.move_to_end(key)
+            while len(self._values) > self.maxsize:
+                self._values.popitem(last=False)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def version(self, key):
+        with self._lock:
+            return self._counters.get(key, 0)
+
+
+class RedisBackend:
+    """Shared store for all workers."""
+
+    def __init__(self, url=None, client=None):
+        if client is None:
+            import redis  # only needed when RESPONSE_CACHE_URL points at redis
+            client = redis.Redis.from_url(url)
+        self._redis = client
+
+    def get(self, key):
+        return self._redis.get(key)
+
+    def set(self, key, value, ttl):
+        self._redis.set(key, value, ex=ttl)
+
+    def incr(self, key):
+        return self._redis.incr(key)
+
+    def version(self, key):
+        return int(self._redis.get(key) or 0)
+
+
+def make_backend(url=RESPONSE_CACHE_URL):
+    if not url:
+        return InProcessBackend()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported RESPONSE_CACHE_URL: {url}")
+
+
+class ResponseCache:
+    """JSON-serializable responses, loaded on a miss and versioned for invalidation."""
+
+    def __init__(self, backend, ttl=RESPONSE_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, name, n=1):
+        with self._stats_lock:
+            self.stats[name] += n
+
+    def get_or_load(self, key, load):
+        """Cached value of key, or load() stored under the key's current version. None is never cached."""
+        versioned = f"{key}@{self.backend.version(f'{key}:v')}"
+        cached = self.backend.get(versioned)
+        if cached is not None:
+            self._count("hits")
+            return json.loads(cached)
+
+        self._count("misses")
+        value = load()
+        if value is not None:
+            self.backend.set(versioned, json.dumps(value, default=str), self.ttl)
+        return value
+
+    def invalidate(self, *keys):
+        for key in keys:
+            self.backend.incr(f"{key}:v")
+        self._count("invalidations", len(keys))
+
+    def metrics(self):
+        with self._stats_lock:
+            return dict(self.stats)
+
+
+def me_key(user_id):
+    return f"me:{user_id}"
+
+
+def trip_key(trip_id):
+    return f"trip:{trip_id}"
+
+
+def trip_messages_key(trip_id):
+    return f"trip:{trip_id}:messages"
+
+
+# Shared cache for the whole app
+response_cache = ResponseCache(make_backend())
+
+
+def invalidate_trip_members(trip_id):
+    """Someone joined or left: the trip's member list and every member's /api/me changed."""
+    from backend.db import db_session
+    from backend.models import Profile
+    user_ids = [row[0] for row in db_session.query(Profile.user_id).filter(Profile.trip_id == trip_id).distinct()]
+    response_cache.invalidate(trip_key(trip_id), *(me_key(user_id) for user_id in user_ids))
+
+
+def invalidate_trip_messages(trip_id):
+    response_cache.invalidate(trip_messages_key(trip_id))
@@ -1,98 +1,112 @@
 """Message related routes for the application."""
 
+import os
+import base64
 import threading
-from pydantic import BaseModel, ValidationError
+from datetime import datetime
+from typing import Any, Optional, cast
+from pydantic import BaseModel, Field, ValidationError
 
 from flask import Blueprint, request, jsonify, current_app
 from backend.db import db_session
 from backend.models import User, Profile, Message, Trip
-from sqlalchemy import desc
+from sqlalchemy import desc, tuple_
+from sqlalchemy.orm import selectinload
+from backend.routes.util import get_user_id_from_cookie
 
 # Import the get_ai_message function from qwen_agent.py
-from backend.ai import get_ai_message
+from backend.ai import get_ai_message, prompt_metrics, system_prompt_tokens
+from backend.ai_context import (AI_CONTEXT_TOKENS, AI_SUMMARY_BATCH, AI_SUMMARY_KEEP_RECENT, build_context,
+                                format_message, load_messages, load_trip_context, summarize)
+from backend.ai_jobs import QueueFullError, ai_jobs
+from agent.llm_gateway import gateway
+from backend.response_cache import invalidate_trip_messages
+from backend.serializers import get_serializer
 
 # Create Blueprint
 message_bp = Blueprint("message", __name__, url_prefix="/api")
 
+# Chat history is served newest page first, MESSAGE_PAGE_SIZE messages at a time
+MESSAGE_PAGE_SIZE = int(os.environ.get("MESSAGE_PAGE_SIZE", 50))
+MESSAGE_PAGE_MAX = 200
+MESSAGE_FIELDS = ("id", "content", "created_at", "user.id", "user.name")
+serialize_message = get_serializer(Message, MESSAGE_FIELDS)
 
-def process_ai_response(trip_id, message_id):
+
+def encode_cursor(message):
+    """Opaque cursor pointing just before `message` in (created_at, id) order."""
+    return base64.urlsafe_b64encode(f"{message.created_at.isoformat()}|{message.id}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Cursor -> (created_at, id). Raises ValueError if it wasn't made by encode_cursor."""
+    created_at, _, message_id = base64.urlsafe_b64decode(cursor.encode()).decode().partition("|")
+    return datetime.fromisoformat(created_at), int(message_id)
+
+
+def message_page(trip_id, before=None, limit=MESSAGE_PAGE_SIZE):
+    """
+    One page of a trip's messages, going back in time from `before` (a decoded cursor)
+    or from the newest message. Keyset pagination on (created_at, id), so every page
+    costs the same no matter how long the chat is.
+
+    Returns (messages oldest first as dicts, cursor of the next older page or None).
+    """
+    query = db_session.query(Message).options(selectinload(Message.user)).filter(Message.trip_id == trip_id)
+    if before is not None:
+        query = query.filter(tuple_(Message.created_at, Message.id) < before)
+
+    # one extra row tells whether there is an older page
+    rows = query.order_by(desc(Message.created_at), desc(Message.id)).limit(limit + 1).all()
+    cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return [serialize_message(msg) for msg in reversed(rows[:limit])], cursor
+
+
+def process_ai_response(trip_id, message_id, cancel_event=None):
     """Background task to process AI response and add to conversation.
     
     Args:
         trip_id: The trip ID for which to generate an AI response
         message_id: The ID of the message that triggered this response
+        cancel_event: Set when a newer message supersedes this generation
     """
     # Create a new session for this thread
     from backend.db import db_session
     print(f"Processing AI response for trip {trip_id} in thread {threading.current_thread().name}")
     
     try:
-        # Get trip details and all users in the trip
-        trip = db_session.query(Trip).filter(Trip.id == trip_id).first()
-        if not trip:
+        if cancel_event is not None and cancel_event.is_set():
+            print(f"AI response for trip {trip_id} superseded before it started")
+            return
+
+        # Trip, members and recent messages in two queries
+        ctx = load_trip_context(db_session, trip_id)
+        if ctx is None:
             print(f"Error: Trip {trip_id} not found")
             return
         
-        # Get all users with their profiles for this trip
-        profiles = db_session.query(Profile).filter(
-            Profile.trip_id == trip_id,
-            Profile.deleted == False
-        ).all()
-        
-        
-        # Get the last 10 messages for context
-        messages = db_session.query(Message).filter(
-            Message.trip_id == trip_id
-        ).order_by(desc(Message.created_at)).limit(10).all()
-        
         # Format messages for the AI model
-        formatted_messages = []
-        for msg in reversed(messages):  # Most recent last
-            if msg.is_ai:
-                formatted_messages.append({
-                    "role": "assistant",
-                    "content": msg.content
-                })
-            else:
-                user_name = msg.user.name if msg.user else "Unknown"
-                formatted_messages.append({
-                    "role": "user",
-                    "content": f"{user_name}: {msg.content}"
-                })
+        formatted_messages = [format_message(msg) for msg in ctx.messages]  # Most recent last
+        user_data = ctx.users
         
         # Get socketio instance - we're now running inside an app context thanks to the wrapper
         from flask import current_app
         socketio = current_app.extensions['socketio']
         
-        # Prepare user data for the AI model
-        user_data = [p.to_dict(only=("user.name", "questions", "questions.question", "questions.answer")) for p in profiles]
-        
-        # Process user data to extract airport information
-        for user_profile in user_data:
-            user_profile["name"] = user_profile["user"]["name"]
-            # Initialize an empty list for airports
-            if 'nearest_airport' not in user_profile:
-                user_profile['nearest_airport'] = []
-                
-            # Try to find the airport answer from questions
-            if 'questions' in user_profile:
-                for question in user_profile.get('questions', []):
-                    # Check for airport-related questions
-                    if isinstance(question, dict) and 'question' in question:
-                        question_text = question.get('question', '').lower()
-                        if ('airport' in question_text or 'icao' in question_text) and 'answer' in question:
-                            # Get the airport answer
-                            airport_code = question.get('answer')
-                            if airport_code and len(airport_code.strip()) > 0:
-                                # Add to nearest airport if it's not empty
-                                user_profile['nearest_airport'].append(airport_code.strip()[1:])
+        # Summary plus as many recent messages as fit next to the system prompt
+        context = build_context(
+            ctx.summary,
+            formatted_messages,
+            AI_CONTEXT_TOKENS - system_prompt_tokens(user_data, trip_id)
+        )
         
         # Get AI response with streaming enabled
         ai_response = get_ai_message(
             user_data,
-            formatted_messages,
+            context,
             socketio=socketio,
-            trip_id=trip_id
+            trip_id=trip_id,
+            cancel_event=cancel_event
         )
         
         # Save the final AI response to the database
@@ -106,6 +120,7 @@ def process_ai_response(trip_id, message_id):
             
             db_session.add(new_ai_message)
             db_session.commit()
+            invalidate_trip_messages(trip_id)
             print(f"AI response added to trip {trip_id}")
             
             # Emit the complete message (will be used by clients that might have missed the streaming updates)
@@ -121,6 +136,11 @@ def process_ai_response(trip_id, message_id):
                 "is_ai": True
             }
             socketio.emit('new_message', message_data, room=f'trip_{trip_id}')
+            
+            # Everybody has the answer, now fold older messages into the summary
+            refresh_trip_summary(ctx)
+        elif cancel_event is not None and cancel_event.is_set():
+            print(f"AI response for trip {trip_id} superseded by a newer message")
         else:
             print("AI response was empty or None")
             
@@ -134,6 +154,23 @@ def process_ai_response(trip_id, message_id):
         db_session.remove()
 
 
+def refresh_trip_summary(ctx):
+    """Fold messages older than the most recent AI_SUMMARY_KEEP_RECENT into the trip summary."""
+    pending = load_messages(db_session, ctx.trip_id, after_id=ctx.summary_message_id, offset=AI_SUMMARY_KEEP_RECENT)
+    
+    # batch the LLM calls instead of summarizing after every turn
+    if len(pending) < AI_SUMMARY_BATCH:
+        return
+    
+    summary = summarize(ctx.summary, [format_message(msg) for msg in pending])
+    summary_message_id = max(msg.id for msg in pending)
+    db_session.query(Trip).filter(Trip.id == ctx.trip_id).update(
+        {Trip.summary: summary, Trip.summary_message_id: summary_message_id}
+    )
+    db_session.commit()
+    print(f"Summary of trip {ctx.trip_id} updated up to message {summary_message_id}")
+
+
 @message_bp.route("/send-message", methods=["POST"])
 def send_message():
     class SendMessageRequest(BaseModel):
@@ -174,6 +211,7 @@ def send_message():
 
         db_session.add(new_message)
         db_session.commit()
+        invalidate_trip_messages(validated_data.trip_id)
         
         # Emit the message via WebSocket, with a sender_id field for identifying who sent it
         message_data = {
@@ -195,25 +233,81 @@ def send_message():
         request_sid = request.sid if hasattr(request, 'sid') else None
         socketio.emit('new_message', message_data, room=f'trip_{validated_data.trip_id}', skip_sid=request_sid)
         
-        # Get app context for background thread
+        # Get app context for the AI worker
         app_context = current_app._get_current_object()
         
-        # Start a background thread to process the AI response with app context
-        def run_with_app_context(app, trip_id, message_id):
+        # Queue the AI response on the shared worker pool, one generation per trip at a time.
+        # Messages arriving in a burst are answered once, after the trip goes quiet.
+        def run_with_app_context(app, trip_id, message_id, cancel_event):
             with app.app_context():
-                process_ai_response(trip_id, message_id)
+                process_ai_response(trip_id, message_id, cancel_event)
         
-        thread = threading.Thread(
-            target=run_with_app_context,
-            args=(app_context, validated_data.trip_id, new_message.id)
-        )
-        thread.daemon = True  # Thread will not prevent the application from exiting
-        thread.start()
+        trip_id = validated_data.trip_id
+
+        def ai_rejected(error):
+            # the client was told the AI is queued, so tell the room it won't answer after all
+            socketio.emit('message_stream', {
+                'type': 'error',
+                'trip_id': trip_id,
+                'error': "The AI is too busy to answer right now. Please try again in a moment.",
+            }, room=f'trip_{trip_id}')
+
+        try:
+            ai_jobs.submit_debounced(trip_id, run_with_app_context,
+                                     app_context, trip_id, new_message.id, on_rejected=ai_rejected)
+            ai_queued = True
+        except QueueFullError as e:
+            # The message is saved either way, the AI just won't answer this one
+            print(e)
+            ai_queued = False
 
         return jsonify(
-            {"message_id": new_message.id, "status": "Message sent successfully"}
+            {"message_id": new_message.id, "status": "Message sent successfully", "ai_queued": ai_queued}
         )
 
     except ValidationError as e:
         return jsonify({"error": "Validation error", "details": e.errors()}), 400
 
+
+@message_bp.route("/messages", methods=["GET"])
+def get_messages():
+    """
+    A page of a trip's chat history for trip members, newest page first.
+    Pass the `cursor` of the previous page as `before` to get older messages.
+    """
+    class MessagesRequest(BaseModel):
+        trip_id: int
+        before: Optional[str] = None
+        limit: int = Field(default=MESSAGE_PAGE_SIZE, ge=1, le=MESSAGE_PAGE_MAX)
+
+    user_id = get_user_id_from_cookie(request)
+    if not user_id:
+        return jsonify({"error": "Not authenticated. No user_id cookie found"}), 401
+
+    try:
+        validated_data = MessagesRequest(**cast(Any, request.args))
+    except ValidationError as e:
+        return jsonify({"error": f"Validation error: {str(e)}"}), 400
+
+    try:
+        before = decode_cursor(validated_data.before) if validated_data.before else None
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+
+    is_member = db_session.query(Profile.id).filter(
+        Profile.user_id == user_id,
+        Profile.trip_id == validated_data.trip_id,
+        Profile.deleted == False
+    ).first()
+    if not is_member:
+        return jsonify({"error": "You are not a member of this trip"}), 403
+
+    messages, cursor = message_page(validated_data.trip_id, before, validated_data.limit)
+    return jsonify({"messages": messages, "cursor": cursor})
+
+
+@message_bp.route("/ai-metrics", methods=["GET"])
+def ai_metrics():
+    """Queue depth, throughput counters and queue wait times of the AI worker pool, plus prompt prefix reuse
+    and the LLM gateway's admission and latency numbers."""
+    return jsonify(dict(ai_jobs.metrics(), prompt=prompt_metrics(), llm=gateway.metrics()))
@@ -9,6 +9,8 @@ from backend.db import db_session
 from backend.models import User, Profile, Trip, Message
 from sqlalchemy.orm import joinedload
 from backend.routes.models import QuestionAnswer
+from backend.ai import invalidate_bot
+from backend.response_cache import invalidate_trip_members, me_key, response_cache
 
 # Create Blueprint
 trip_bp = Blueprint("trip", __name__, url_prefix="/api")
@@ -103,6 +105,9 @@ def create_trip():
         db_session.add(profile)
         db_session.commit()
 
+        # The creator's trip list changed
+        response_cache.invalidate(me_key(user.id))
+
         # Create response object
         response = make_response(
             jsonify(
@@ -231,6 +236,10 @@ def join_trip():
         db_session.add(profile)
         db_session.commit()
 
+        # The trip's members changed, the cached bot has stale user details
+        invalidate_bot(validated_data.trip_id)
+        invalidate_trip_members(validated_data.trip_id)
+
         # Create response object
         response = make_response(
             jsonify(
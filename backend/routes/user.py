@@ -4,37 +4,53 @@ from typing import Any, cast
 from flask import Blueprint, request, jsonify
 from sqlalchemy.orm import joinedload
 from backend.db import db_session
-from backend.models import Message, User, Profile, Trip
+from backend.models import User, Profile, Trip
 from sqlalchemy.exc import SQLAlchemyError
 from pydantic import BaseModel, ValidationError
 from backend.routes.util import get_user_id_from_cookie
+from backend.ai import invalidate_bot
+from backend.routes.message import message_page
+from backend.serializers import get_serializer
+from backend.response_cache import (invalidate_trip_members, me_key, response_cache, trip_key,
+                                    trip_messages_key)
 
 # Create Blueprint
 user_bp = Blueprint("user", __name__, url_prefix="/api")
 
+# Compiled once, same output as to_dict(only=...) on these fields
+serialize_me = get_serializer(User, ("id", "name", "trips", "trips.name", "trips.id", "trips.users.id", "trips.users.name"))
+serialize_trip = get_serializer(Trip, ("id", "name", "users.id", "users.name"))
+
 @user_bp.route("/me", methods=["GET"])
 def me():
     user_id = get_user_id_from_cookie(request)
     if not user_id:
         return jsonify({"error": "Not authenticated. No user_id cookie found"}), 401
 
-    user = db_session.query(User).options(
-        joinedload(User.trips).joinedload(Trip.users)
-    ).filter(
-        User.id == user_id
-    ).first()
+    def load_me():
+        user = db_session.query(User).options(
+            joinedload(User.trips).joinedload(Trip.users)
+        ).filter(
+            User.id == user_id
+        ).first()
+        if not user:
+            return None
+        return serialize_me(user)
 
-    if not user:
+    # Cached until the user's trips or their members change
+    me_data = response_cache.get_or_load(me_key(user_id), load_me)
+    if not me_data:
         return jsonify({"error": "User not found"}), 401
 
-    return user.to_dict(only=("id", "name", "trips", "trips.name", "trips.id", "trips.users.id", "trips.users.name"))
+    return me_data
 
 @user_bp.route("/trip-info", methods=["GET"])
 def trip_info():
     """
     Get information about a trip.
     If the user is not a member of the trip, only the trip name and users will be returned.
-    If the user is a member, all trip information including messages will be returned.
+    If the user is a member, the latest page of messages is returned too, with the
+    cursor for older ones (see /api/messages).
     Returns JSON with trip information.
     """
     class TripInfoRequest(BaseModel):
@@ -45,24 +61,38 @@ def trip_info():
     except ValidationError as e:
         return jsonify({"error": f"Validation error: {str(e)}"}), 400
 
-    # Build a single query with all necessary joinedloads
-    trip = db_session.query(Trip).options(
-        joinedload(Trip.users),
-        joinedload(Trip.messages).joinedload(Message.user)
-    ).filter(Trip.id == validated_data.trip_id).first()
-    
-    if not trip:
+    trip_id = validated_data.trip_id
+
+    def load_trip():
+        # Members only; messages are loaded a page at a time below
+        trip = db_session.query(Trip).options(
+            joinedload(Trip.users)
+        ).filter(Trip.id == trip_id).first()
+        if not trip:
+            return None
+        return serialize_trip(trip)
+
+    def load_messages():
+        messages, cursor = message_page(trip_id)
+        return {"messages": messages, "cursor": cursor}
+
+    # Cached until someone joins or leaves
+    trip_data = response_cache.get_or_load(trip_key(trip_id), load_trip)
+    if not trip_data:
         return jsonify({"error": "Trip not found"}), 404
 
     user_id = get_user_id_from_cookie(request)
-    if user_id and user_id in [user.id for user in trip.users]:
+    if user_id and user_id in [user["id"] for user in trip_data["users"]]:
+        # Cached until the next message
+        page = response_cache.get_or_load(trip_messages_key(trip_id), load_messages)
         return {
-            "trip": trip.to_dict(only=("id", "name", "users.id", "users.name", "messages.id", "messages.content", "messages.user.id", "messages.user.name")),
+            "trip": dict(trip_data, messages=page["messages"]),
+            "messages_cursor": page["cursor"],
             "is_member": True,
         } 
     else:
         return {
-            "trip": trip.to_dict(only=("id", "name", "users.id", "users.name")),
+            "trip": trip_data,
             "is_member": False
         }
 
@@ -98,6 +128,8 @@ def leave_trip():
     # Soft delete the profile
     profile.deleted = True
     db_session.commit()
+    invalidate_bot(validated_data.trip_id)
+    invalidate_trip_members(validated_data.trip_id)
     
     return jsonify({"message": "Successfully left the trip"}), 200
         
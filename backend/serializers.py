@@ -0,0 +1,100 @@
+"""Precompiled serializers for the hot endpoints.
+
+SerializerMixin.to_dict(only=...) parses the dotted rules and walks the model
+reflectively on every call. get_serializer compiles a spec once per (model, only)
+into nested closures that read exactly the listed attributes, with column types
+and relationship shapes resolved up front. Output matches to_dict(only=...),
+including its datetime and date formats.
+
+    serialize_trip = get_serializer(Trip, ("id", "name", "users.id", "users.name"))
+    serialize_trip(trip)  # -> {"id": 1, "name": "...", "users": [{"id": 2, "name": "..."}]}
+"""
+
+import threading
+from datetime import date, datetime, time
+from decimal import Decimal
+from sqlalchemy import inspect
+
+from backend.models import Base
+
+_registry = {}  # (model, only) -> compiled function
+_registry_lock = threading.Lock()
+
+
+def parse_rules(only):
+    """("trips.name", "trips.id", "id") -> {"trips": {"name": {}, "id": {}}, "id": {}}, in spec order."""
+    tree = {}
+    for rule in only:
+        node = tree
+        for part in rule.split("."):
+            node = node.setdefault(part, {})
+    return tree
+
+
+def format_value(value):
+    """Scalars the way SerializerMixin formats them."""
+    if isinstance(value, datetime):
+        return value.strftime(Base.datetime_format)
+    if isinstance(value, date):
+        return value.strftime(Base.date_format)
+    if isinstance(value, time):
+        return value.strftime(Base.time_format)
+    if isinstance(value, Decimal):
+        return Base.decimal_format.format(value)
+    return value
+
+
+def _select_keys(value, tree):
+    # dotted rules into a JSON column: keep only the listed keys, element by element
+    if isinstance(value, dict):
+        return {key: _select_keys(value[key], tree[key]) for key in tree if key in value}
+    if isinstance(value, (list, tuple)):
+        return [_select_keys(item, tree) for item in value]
+    return value
+
+
+def _compile(model, tree):
+    mapper = inspect(model)
+    fields = []
+    for name, children in tree.items():
+        relationship = mapper.relationships.get(name)
+        if relationship is not None:
+            child = _compile(relationship.mapper.class_, children or parse_rules(relationship.mapper.class_.serialize_only or ("id",)))
+            if relationship.uselist:
+                fields.append((name, lambda obj, name=name, child=child: [child(item) for item in getattr(obj, name)]))
+            else:
+                fields.append((name, lambda obj, name=name, child=child: None if (value := getattr(obj, name)) is None else child(value)))
+            continue
+
+        column = mapper.columns.get(name)
+        python_type = None
+        if column is not None:
+            try:
+                python_type = column.type.python_type
+            except NotImplementedError:
+                python_type = None
+
+        if children:
+            fields.append((name, lambda obj, name=name, children=children: _select_keys(getattr(obj, name), children)))
+        elif python_type in (int, str, bool):
+            # nothing to format, read the attribute as is
+            fields.append((name, None))
+        else:
+            fields.append((name, lambda obj, name=name: format_value(getattr(obj, name))))
+
+    def serialize(obj):
+        return {name: getattr(obj, name) if read is None else read(obj) for name, read in fields}
+
+    return serialize
+
+
+def get_serializer(model, only):
+    """Compiled serializer for model instances, equivalent to obj.to_dict(only=only)."""
+    key = (model, tuple(only))
+    serializer = _registry.get(key)
+    if serializer is None:
+        with _registry_lock:
+            serializer = _registry.get(key)
+            if serializer is None:
+                serializer = _registry[key] = _compile(model, parse_rules(only))
+    return serializer